@@ -1,11 +1,30 @@
+from collections import OrderedDict
 from functools import wraps
-from flask import Flask, jsonify, abort, request
+from flask import Flask, jsonify, abort, g, request
+import hashlib
+import json
+import os
+import threading
+import time
 import requests
 from jose import jwt
+from jwt_backends import get_backend
 
-AUTH0_DOMAIN = 'nd0044-project-05-capstone.us.auth0.com'
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN',
+                              'nd0044-project-05-capstone.us.auth0.com')
 ALGORITHMS = ['RS256']
-API_AUDIENCE = 'restaurant'
+API_AUDIENCE = os.environ.get('API_AUDIENCE', 'restaurant')
+AUTH_ISSUER = os.environ.get('AUTH_ISSUER', f'https://{AUTH0_DOMAIN}/')
+
+# An http(s) URL, or a file:// URL or path to a local JWKS document.
+JWKS_URL = os.environ.get('JWKS_URL',
+                          f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+JWKS_CACHE_TTL = int(os.environ.get('JWKS_CACHE_TTL', 600))
+JWKS_MIN_REFETCH_INTERVAL = \
+    int(os.environ.get('JWKS_MIN_REFETCH_INTERVAL', 30))
+JWKS_FETCH_TIMEOUT = int(os.environ.get('JWKS_FETCH_TIMEOUT', 5))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 4096))
+JWT_BACKEND = os.environ.get('JWT_BACKEND', 'jose')
 
 
 class AuthError(Exception):
@@ -14,6 +33,233 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+class JWKSKeyStore:
+    """In-process cache of the identity provider's JWKS document.
+
+    Keys are served from memory for `ttl` seconds.  Once the document is
+    stale it keeps being served while a single background thread refetches
+    it.  An unknown `kid` forces a synchronous refetch, at most once every
+    `min_refetch_interval` seconds so bad tokens cannot hammer the issuer.
+    The first fetch and those refetches are made by one request while the
+    others wait for its result, and a failed first fetch is not retried
+    for `min_refetch_interval` seconds either.
+
+    Each fetched document is also parsed once into a kid -> key object
+    index for the verification backend.
+
+    The document comes from `url` (http(s), file:// or a plain path), or
+    from the in-memory `keys` list when one is given.
+    """
+
+    def __init__(self, url, ttl=JWKS_CACHE_TTL,
+                 min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL,
+                 timeout=JWKS_FETCH_TIMEOUT, session=None, backend=None,
+                 keys=None):
+        self.url = url
+        self.keys = keys
+        self.backend = backend or get_backend(JWT_BACKEND)
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.fetch_count = 0
+        self._keys = None
+        self._signing_keys = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        # Held by the one request fetching in the foreground; concurrent
+        # requests wait for its result instead of fetching too.
+        self._fetch_lock = threading.Lock()
+
+    def _load_signing_keys(self, keys):
+        signing_keys = {}
+        for kid, key in keys.items():
+            if key.get('kty') != 'RSA' or key.get('use', 'sig') != 'sig':
+                continue
+            try:
+                signing_keys[kid] = self.backend.load_key(key)
+            except Exception:
+                # An unparseable key can never verify a token; skip it.
+                continue
+        return signing_keys
+
+    def _load_document(self):
+        if self.keys is not None:
+            return {'keys': self.keys}
+        if '://' not in self.url or self.url.startswith('file://'):
+            path = self.url[len('file://'):] \
+                if self.url.startswith('file://') else self.url
+            with open(path) as document:
+                return json.load(document)
+        response = self.session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch(self):
+        with self._lock:
+            self._last_attempt = time.monotonic()
+        keys = {key['kid']: key for key in self._load_document()['keys']}
+        signing_keys = self._load_signing_keys(keys)
+        with self._lock:
+            self._keys = keys
+            self._signing_keys = signing_keys
+            self._fetched_at = time.monotonic()
+            self.fetch_count += 1
+        return keys
+
+    def _background_refresh(self):
+        try:
+            self.fetch()
+        except Exception:
+            # Keep serving the stale document; the next request retries.
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh,
+                         daemon=True).start()
+
+    def _first_fetch(self):
+        with self._fetch_lock:
+            if self._keys is not None:
+                return self._keys
+            if self._last_attempt and time.monotonic() - \
+                    self._last_attempt < self.min_refetch_interval:
+                raise RuntimeError('JWKS fetch failed recently')
+            return self.fetch()
+
+    def get_key(self, kid):
+        keys = self._keys
+        if keys is None:
+            keys = self._first_fetch()
+        elif time.monotonic() - self._fetched_at > self.ttl:
+            self._refresh_in_background()
+
+        if kid in keys:
+            return keys[kid]
+
+        # Unknown kid: the issuer may have rotated its keys.
+        with self._fetch_lock:
+            keys = self._keys
+            if kid in keys:
+                return keys[kid]
+            if time.monotonic() - self._last_attempt < \
+                    self.min_refetch_interval:
+                return None
+            try:
+                keys = self.fetch()
+            except Exception:
+                return None
+        return keys.get(kid)
+
+    def get_signing_key(self, kid):
+        if self.get_key(kid) is None:
+            return None
+        return self._signing_keys.get(kid)
+
+    def clear(self):
+        with self._lock:
+            self._keys = None
+            self._signing_keys = {}
+            self._fetched_at = 0.0
+            self._last_attempt = 0.0
+
+    def configure(self, url=None, keys=None):
+        """Switch to another JWKS source and drop the cached keys."""
+        if url is not None:
+            self.url = url
+        self.keys = keys
+        self.clear()
+
+
+jwks_store = JWKSKeyStore(JWKS_URL)
+
+
+class VerifiedToken:
+    __slots__ = ('payload', 'exp', 'permissions')
+
+    def __init__(self, payload, exp):
+        self.payload = payload
+        self.exp = exp
+        # permission -> None when granted, or the (error, status_code) of
+        # the AuthError to raise.  Not the exception itself: re-raising one
+        # instance keeps adding frames to its traceback.
+        self.permissions = {}
+
+
+class TokenCache:
+    """Bounded LRU of verified JWT payloads keyed by the token's digest.
+
+    Entries live until the token's `exp` claim passes, so a repeat token
+    skips the signature, claims and permission checks entirely.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.exp > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        entry = VerifiedToken(payload, payload.get('exp'))
+        if not isinstance(entry.exp, (int, float)) or self.maxsize <= 0:
+            return entry
+
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+token_cache = TokenCache()
+
+
 def get_token_auth_header():
     headers = request.headers
     if 'Authorization' not in headers:
@@ -45,9 +291,6 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = requests.get(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = jsonurl.json()
-
     try:
         unverified_header = jwt.get_unverified_header(token)
     except Exception as e:
@@ -56,32 +299,29 @@ def verify_decode_jwt(token):
             'description': 'Authorization malformed.'
         }, 401)
 
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    try:
+        signing_key = jwks_store.get_signing_key(unverified_header['kid'])
+    except Exception:
+        raise AuthError({
+            'code': 'jwks_unavailable',
+            'description': 'Unable to fetch signing keys.'
+        }, 401)
 
-    if rsa_key:
+    if signing_key is not None:
         try:
             # USE THE KEY TO VALIDATE THE JWT
-            payload = jwt.decode(
+            payload = jwks_store.backend.decode(
                 token,
-                rsa_key,
+                signing_key,
                 algorithms=ALGORITHMS,
                 audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
+                issuer=AUTH_ISSUER
             )
 
             return payload
@@ -129,18 +369,37 @@ def check_permissions(permission, payload):
     return True
 
 
+def check_permissions_cached(permission, entry):
+    if permission not in entry.permissions:
+        try:
+            check_permissions(permission, entry.payload)
+            entry.permissions[permission] = None
+        except AuthError as ae:
+            entry.permissions[permission] = (ae.error, ae.status_code)
+
+    outcome = entry.permissions[permission]
+    if outcome is not None:
+        raise AuthError(*outcome)
+    return True
+
+
 def requires_auth(permission=''):
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
+            started = time.perf_counter()
             try:
                 token = get_token_auth_header()
-                payload = verify_decode_jwt(token)
-                check_permissions(permission, payload)
+                entry = token_cache.get(token)
+                if entry is None:
+                    entry = token_cache.put(token, verify_decode_jwt(token))
+                check_permissions_cached(permission, entry)
             except AuthError as ae:
                 abort(ae.status_code)
+            finally:
+                g.auth_time = time.perf_counter() - started
 
-            return f(payload, *args, **kwargs)
+            return f(entry.payload, *args, **kwargs)
 
         return wrapper
     return requires_auth_decorator
@@ -0,0 +1,164 @@
+"""Local stand-in for the Auth0 tenant.
+
+A TokenIssuer holds an RSA signing key, publishes its JWKS document and
+mints tokens for the API's roles, so the API, its tests and the benchmarks
+run without reaching Auth0.  To run the API against it:
+
+    python auth_stand_in.py --key stand-in.pem --jwks stand-in-jwks.json \\
+        --role manager
+    JWKS_URL=stand-in-jwks.json flask run
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import rsa
+from jose import jwt
+from auth import ALGORITHMS, API_AUDIENCE, AUTH_ISSUER
+
+ROLE_PERMISSIONS = {
+    'server': ('read:checks', 'read:employees'),
+    'manager': ('read:checks', 'read:employees', 'create:employees',
+                'update:employees', 'delete:employees')
+}
+
+
+def b64_int(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def public_jwk(private_key):
+    """The JWK of `private_key`'s public half; its kid is derived from the
+    modulus, so a saved key always gets the same kid.
+    """
+    n = b64_int(private_key.n)
+    return {
+        'kty': 'RSA',
+        'kid': hashlib.sha256(n.encode()).hexdigest()[:16],
+        'use': 'sig',
+        'alg': ALGORITHMS[0],
+        'n': n,
+        'e': b64_int(private_key.e)
+    }
+
+
+class TokenIssuer:
+    """Signs tokens with its own RSA key for the configured issuer and
+    audience.
+    """
+
+    def __init__(self, private_pem=None, bits=2048, issuer=AUTH_ISSUER,
+                 audience=API_AUDIENCE):
+        if private_pem is None:
+            private_pem = rsa.newkeys(bits)[1].save_pkcs1().decode()
+        self.private_pem = private_pem
+        self.public_jwk = public_jwk(rsa.PrivateKey.load_pkcs1(private_pem))
+        self.issuer = issuer
+        self.audience = audience
+
+    @classmethod
+    def from_file(cls, path, bits=2048, **kwargs):
+        """Load the key saved at `path`, creating it first if needed."""
+        if not os.path.exists(path):
+            issuer = cls(bits=bits, **kwargs)
+            with open(path, 'w') as key_file:
+                key_file.write(issuer.private_pem)
+            return issuer
+        with open(path) as key_file:
+            return cls(key_file.read(), **kwargs)
+
+    @property
+    def kid(self):
+        return self.public_jwk['kid']
+
+    @property
+    def jwks(self):
+        return {'keys': [self.public_jwk]}
+
+    def mint(self, permissions=(), expires_in=3600, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': self.issuer,
+            'sub': 'stand-in|user',
+            'aud': self.audience,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(permissions)
+        }
+        payload.update(claims)
+        return jwt.encode(payload, self.private_pem, algorithm=ALGORITHMS[0],
+                          headers={'kid': self.kid})
+
+    def mint_role(self, role, **kwargs):
+        return self.mint(ROLE_PERMISSIONS[role], sub=f'stand-in|{role}',
+                         **kwargs)
+
+    def install(self, store=None):
+        """Make `store` (default auth.jwks_store) trust only this issuer's
+        key, held in memory.
+        """
+        if store is None:
+            from auth import jwks_store as store
+        store.configure(keys=[self.public_jwk])
+
+
+class JWKSServer(HTTPServer):
+    """Serves a JWKS document on localhost.  `keys` may be replaced to
+    simulate a key rotation; `hits` counts the fetches.
+    """
+
+    def __init__(self, keys):
+        super().__init__(('127.0.0.1', 0), JWKSHandler)
+        self.keys = keys
+        self.hits = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/.well-known/jwks.json'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits += 1
+        body = json.dumps({'keys': self.server.keys}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mint a token signed by a local stand-in key.')
+    parser.add_argument('--key', default='auth-stand-in.pem',
+                        help='Private key file; created if missing')
+    parser.add_argument('--jwks', help='Also write the JWKS document here')
+    parser.add_argument('--role', choices=sorted(ROLE_PERMISSIONS),
+                        default='manager')
+    parser.add_argument('--expires-in', dest='expires_in', type=int,
+                        default=3600, help='Token lifetime in seconds')
+    args = parser.parse_args()
+
+    issuer = TokenIssuer.from_file(args.key)
+    if args.jwks:
+        with open(args.jwks, 'w') as jwks_file:
+            json.dump(issuer.jwks, jwks_file)
+    print(issuer.mint_role(args.role, expires_in=args.expires_in))
+
+
+if __name__ == '__main__':
+    main()
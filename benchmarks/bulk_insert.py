@@ -0,0 +1,53 @@
+"""Compare N single-row employee inserts against one bulk insert.
+
+The single path mirrors post_employees (one ORM add + commit per row); the
+bulk path is what POST /employees/bulk runs:
+
+    python -m benchmarks.bulk_insert --employees 500 --rounds 5
+"""
+import argparse
+import time
+from benchmarks.common import benchmark_app
+from models import db, Employee
+from queries import insert_employees
+
+
+def single_path(names):
+    for name in names:
+        db.session.add(Employee(name=name))
+        db.session.commit()
+
+
+def bulk_path(names):
+    insert_employees(names)
+    db.session.commit()
+
+
+def measure(label, path, names, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        path(names)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        db.session.remove()
+
+    print(f'{label:<7} {len(names) / best:>10.0f} employees/s '
+          f'{best * 1e3:>9.1f} ms per batch of {len(names)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    names = [f'Benchmark Employee {i}' for i in range(args.employees)]
+    app = benchmark_app()
+    with app.app_context():
+        for label, path in (('single', single_path), ('bulk', bulk_path)):
+            measure(label, path, names, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
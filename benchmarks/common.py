@@ -0,0 +1,28 @@
+import os
+
+# Benchmarks seed and rewrite tables, so they never default to DATABASE_URL.
+BENCHMARK_DATABASE_URL = os.environ.get('BENCHMARK_DATABASE_URL', 'sqlite://')
+os.environ.setdefault('DATABASE_URL', BENCHMARK_DATABASE_URL)
+
+from flask import Flask  # noqa: E402
+from models import db, setup_db  # noqa: E402
+
+
+def benchmark_app():
+    """A bare Flask app bound to BENCHMARK_DATABASE_URL with tables created."""
+    app = Flask(__name__)
+    setup_db(app, BENCHMARK_DATABASE_URL)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def benchmark_api_app():
+    """create_app() rebound to BENCHMARK_DATABASE_URL with tables created."""
+    from flaskr import create_app
+
+    app = create_app()
+    setup_db(app, BENCHMARK_DATABASE_URL, [])
+    with app.app_context():
+        db.create_all()
+    return app
@@ -0,0 +1,337 @@
+"""Drive every API route and report throughput, latency and peak memory.
+
+Seeds BENCHMARK_DATABASE_URL with synthetic data, signs tokens with a local
+stand-in issuer whose key is held in memory, then runs each endpoint in its
+own forked process and prints one JSON document:
+
+    python -m benchmarks.endpoints --employees 1000 --checks 1000000 \\
+        --requests 200 --output results.json
+
+Pass --baseline with an earlier output file to add ratios against it.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from benchmarks.common import benchmark_api_app
+from auth_stand_in import TokenIssuer
+import synthetic
+from models import db, Check, Employee, EmployeeCheckCount
+from queries import insert_employees
+from response_cache import response_cache
+
+BULK_SIZE = 10
+
+
+class Scenario:
+    """One endpoint: the route it covers and how to build each request.
+
+    `path` and `body` are called with (request number, setup result);
+    `setup(requests)` runs in the benchmark process before timing starts.
+    """
+
+    def __init__(self, method, rule, path, body=None, setup=None,
+                 stream=False, heavy=False):
+        self.name = f'{method} {rule if callable(path) else path}'
+        self.method = method
+        self.rule = rule
+        self.path = path if callable(path) else (lambda i, ctx: path)
+        self.body = body
+        self.setup = setup
+        self.stream = stream
+        self.heavy = heavy
+
+
+def new_employees(count):
+    ids = insert_employees([f'Benchmark Employee {i}' for i in range(count)])
+    db.session.commit()
+    return ids
+
+
+def existing_employees(count):
+    return [row.id for row in Employee.query.order_by(Employee.id)
+            .limit(count)]
+
+
+def busiest_employee(requests):
+    return EmployeeCheckCount.query \
+        .order_by(EmployeeCheckCount.check_count.desc()).first().employee_id
+
+
+SCENARIOS = [
+    Scenario('GET', '/', '/'),
+    Scenario('GET', '/metrics', '/metrics'),
+    Scenario('GET', '/pool', '/pool'),
+    Scenario('GET', '/checks', '/checks'),
+    Scenario('GET', '/checks', '/checks?limit=1000&count=none'),
+    Scenario('GET', '/checks/summary', '/checks/summary'),
+    Scenario('GET', '/checks/stream', '/checks/stream', stream=True),
+    Scenario('GET', '/checks/export', '/checks/export?format=ndjson',
+             heavy=True),
+    Scenario('GET', '/employees', '/employees'),
+    Scenario('GET', '/employees', '/employees?include=checks'),
+    Scenario('GET', '/changes', '/changes?limit=1000'),
+    Scenario('GET', '/employees/<int:employee_id>/checks',
+             lambda i, ctx: f'/employees/{ctx}/checks',
+             setup=busiest_employee),
+    Scenario('POST', '/employees', '/employees',
+             body=lambda i, ctx: {'name': f'Benchmark Employee {i}'}),
+    Scenario('POST', '/employees/bulk', '/employees/bulk',
+             body=lambda i, ctx: {'employees': [
+                 {'name': f'Benchmark Employee {i}.{j}'}
+                 for j in range(BULK_SIZE)]}),
+    Scenario('PATCH', '/employees/<int:employee_id>',
+             lambda i, ctx: f'/employees/{ctx[0]}',
+             body=lambda i, ctx: {'name': f'Renamed {i}'},
+             setup=lambda requests: existing_employees(1)),
+    Scenario('PATCH', '/employees/bulk', '/employees/bulk',
+             body=lambda i, ctx: {'employees': [
+                 {'id': employee_id, 'name': f'Renamed {i}'}
+                 for employee_id in ctx]},
+             setup=lambda requests: existing_employees(BULK_SIZE)),
+    Scenario('DELETE', '/employees/<int:employee_id>',
+             lambda i, ctx: f'/employees/{ctx[i]}',
+             setup=new_employees),
+    Scenario('DELETE', '/employees/bulk', '/employees/bulk',
+             body=lambda i, ctx: {
+                 'ids': ctx[i * BULK_SIZE:(i + 1) * BULK_SIZE]},
+             setup=lambda requests: new_employees(requests * BULK_SIZE)),
+]
+
+
+def check_coverage(app):
+    """Fail if a route has no scenario, so new endpoints get benchmarked."""
+    covered = {(scenario.method, scenario.rule) for scenario in SCENARIOS}
+    missing = sorted(
+        f'{method} {rule.rule}'
+        for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+        if (method, rule.rule) not in covered)
+    if missing:
+        sys.exit('No benchmark scenario for: ' + ', '.join(missing))
+
+
+def seed(employees, checks):
+    existing_employees = Employee.query.count()
+    existing_checks = Check.query.count()
+    synthetic.generate_data(max(employees - existing_employees, 0),
+                            max(checks - existing_checks, 0))
+    db.session.remove()
+
+
+def resident_kb():
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return 0
+
+
+def reset_peak_rss():
+    """Restart the peak RSS count (Linux), which a forked child otherwise
+    inherits from the parent's seeding.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(sorted_values, fraction):
+    index = round(fraction * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def issue(client, scenario, i, ctx, headers):
+    kwargs = {'method': scenario.method, 'headers': headers}
+    if scenario.body:
+        kwargs['json'] = scenario.body(i, ctx)
+    path = scenario.path(i, ctx)
+
+    if scenario.stream:
+        # Time to the first event; the stream itself never ends.
+        response = client.open(path, buffered=False, **kwargs)
+        size = len(next(iter(response.response)))
+        response.close()
+    else:
+        response = client.open(path, **kwargs)
+        size = len(response.get_data())
+    query_count = int(response.headers.get('X-Query-Count', 0))
+    return response.status_code, query_count, size
+
+
+def run_scenario(app, scenario, requests, warmup, headers, results):
+    total = warmup + requests
+    with app.app_context():
+        ctx = scenario.setup(total) if scenario.setup else None
+        db.session.remove()
+
+    client = app.test_client()
+    for i in range(warmup):
+        issue(client, scenario, i, ctx, headers)
+
+    reset_peak_rss()
+    rss_before = resident_kb()
+    statuses = Counter()
+    queries = 0
+    sent = 0
+    latencies = []
+    started = time.perf_counter()
+    for i in range(warmup, total):
+        request_started = time.perf_counter()
+        status, query_count, size = issue(client, scenario, i, ctx,
+                                          headers)
+        latencies.append(time.perf_counter() - request_started)
+        statuses[status] += 1
+        queries += query_count
+        sent += size
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    peak_rss = peak_rss_kb()
+    results.put({
+        'name': scenario.name,
+        'requests': requests,
+        'statuses': {str(status): count for status, count in
+                     sorted(statuses.items())},
+        'throughput_rps': round(requests / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries_per_request': round(queries / requests, 2),
+        'bytes_per_response': round(sent / requests),
+        'peak_rss_kb': peak_rss,
+        'rss_growth_kb': max(peak_rss - rss_before, 0)
+    })
+
+
+def run(app, scenario, requests, warmup, headers):
+    """Run `scenario` in a forked process, so its writes, caches and memory
+    high-water mark don't carry over to the next one.
+    """
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            # Children must not share the parent's pooled connections.  An
+            # in-memory SQLite database lives in its one connection instead.
+            db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=run_scenario, args=(
+        app, scenario, requests, warmup, headers, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = {result['name']: result
+                    for result in json.load(baseline_file)['results']}
+    for result in results:
+        previous = baseline.get(result['name'])
+        if previous:
+            result['baseline'] = {
+                key + '_ratio': round(result[key] / previous[key], 3)
+                if previous.get(key) else None
+                for key in ('throughput_rps', 'p50_ms', 'p99_ms',
+                            'bytes_per_response', 'peak_rss_kb')
+            }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--checks', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--heavy-requests', type=int, default=5,
+                        help='Requests for whole-table endpoints (export)')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--no-response-cache', action='store_true')
+    parser.add_argument('--accept-encoding', dest='accept_encoding',
+                        help='Accept-Encoding header to send, e.g. gzip')
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    args = parser.parse_args()
+
+    issuer = TokenIssuer()
+    issuer.install()
+    headers = {'Authorization': 'Bearer ' + issuer.mint_role('manager')}
+    if args.accept_encoding:
+        headers['Accept-Encoding'] = args.accept_encoding
+
+    app = benchmark_api_app()
+    app.config['QUERY_STATS_HEADERS'] = True
+    check_coverage(app)
+    if args.no_response_cache:
+        response_cache.max_bytes = 0
+
+    with app.app_context():
+        seed(args.employees, args.checks)
+        employees = Employee.query.count()
+        checks = Check.query.count()
+        database = db.engine.dialect.name
+        db.session.remove()
+
+    results = []
+    for scenario in SCENARIOS:
+        requests = args.heavy_requests if scenario.heavy else args.requests
+        warmup = 1 if scenario.heavy else args.warmup
+        results.append(run(app, scenario, requests, warmup, headers))
+        print(f'{results[-1]["name"]}: '
+              f'{results[-1]["throughput_rps"]} req/s', file=sys.stderr)
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'database': database,
+            'employees': employees,
+            'checks': checks,
+            'response_cache': not args.no_response_cache,
+            'accept_encoding': args.accept_encoding
+        },
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
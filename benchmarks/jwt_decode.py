@@ -0,0 +1,61 @@
+"""Compare RS256 decode throughput of the JWT verification backends.
+
+Tokens are minted locally, so no Auth0 tenant is needed:
+
+    python -m benchmarks.jwt_decode --tokens 200 --rounds 5
+"""
+import argparse
+import time
+from auth import ALGORITHMS, API_AUDIENCE, AUTH_ISSUER
+from auth_stand_in import TokenIssuer
+from jwt_backends import JoseBackend, available_backends
+
+
+def mint_tokens(issuer, count,
+                permissions=('read:checks', 'read:employees')):
+    return [issuer.mint(permissions, sub=f'benchmark|{i}')
+            for i in range(count)]
+
+
+def run(label, decode, tokens, rounds):
+    decode(tokens[0])
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for token in tokens:
+            decode(token)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    rate = len(tokens) / best
+    print(f'{label:<30} {rate:>10.0f} tokens/s '
+          f'{best / len(tokens) * 1e6:>8.1f} us/token')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    issuer = TokenIssuer()
+    public_jwk = issuer.public_jwk
+    tokens = mint_tokens(issuer, args.tokens)
+
+    # The previous code path: a fresh JWK dict on every call, so python-jose
+    # rebuilds the RSA public key from n/e each time.
+    jose_backend = JoseBackend()
+    run('jose (jwk dict per call)',
+        lambda token: jose_backend.decode(token, dict(public_jwk), ALGORITHMS,
+                                          API_AUDIENCE, AUTH_ISSUER),
+        tokens, args.rounds)
+
+    for backend in available_backends():
+        key = backend.load_key(public_jwk)
+        run(f'{backend.name} (pre-parsed key)',
+            lambda token: backend.decode(token, key, ALGORITHMS,
+                                         API_AUDIENCE, AUTH_ISSUER),
+            tokens, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
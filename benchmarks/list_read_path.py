@@ -0,0 +1,77 @@
+"""Compare the ORM and Core read paths used by the list endpoints.
+
+Reports rows/sec and peak Python memory for loading and formatting a page
+of checks via `Model.query...all()` + `format()` versus `keyset_rows`:
+
+    python -m benchmarks.list_read_path --rows 100000 --page 1000
+
+Set BENCHMARK_DATABASE_URL to benchmark against a scratch PostgreSQL
+database; the default is an in-memory SQLite database.
+"""
+import argparse
+import time
+import tracemalloc
+from benchmarks.common import benchmark_app
+from models import db, Check, Employee
+from queries import keyset_page, keyset_rows
+
+
+def seed(rows):
+    if Check.query.count() >= rows:
+        return
+    db.session.add(Employee(name='Benchmark Employee'))
+    db.session.commit()
+    employee_id = Employee.query.first().id
+    db.session.execute(Check.__table__.insert(),
+                       [{'employee_id': employee_id} for _ in range(rows)])
+    db.session.commit()
+
+
+def orm_path(limit):
+    checks, _ = keyset_page(Check.query, Check.id, 0, limit)
+    return [check.format() for check in checks]
+
+
+def core_path(limit):
+    checks, _ = keyset_rows(Check, 0, limit)
+    return checks
+
+
+def measure(label, path, limit, rounds):
+    path(limit)
+    db.session.remove()
+
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        path(limit)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        db.session.remove()
+
+    tracemalloc.start()
+    path(limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+
+    print(f'{label:<6} {limit / best:>12.0f} rows/s '
+          f'{peak / 1024:>10.0f} KiB peak')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--page', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app = benchmark_app()
+    with app.app_context():
+        seed(args.rows)
+        for label, path in (('orm', orm_path), ('core', core_path)):
+            measure(label, path, args.page, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Compare jsonify() and get_json() throughput of the JSON providers.
+
+Payloads are built from Check.format() and Employee.format() at the sizes
+the list endpoints return, so no database is needed:
+
+    python -m benchmarks.serialization --rows 1000 --rounds 20
+"""
+import argparse
+import json
+import time
+import benchmarks.common  # noqa: F401 (sets a default DATABASE_URL)
+from flask import Flask, jsonify, json as flask_json
+from json_provider import available_providers, init_json_provider
+from models import Check, Employee
+from request_metrics import RequestMetrics, init_request_metrics
+
+CHECKS_PER_EMPLOYEE = 10
+
+
+def payloads(rows):
+    checks = [Check(id=i, employee_id=i % 97 + 1).format()
+              for i in range(1, rows + 1)]
+    employees = [Employee(id=i, name=f'Synthetic Employee {i}').format()
+                 for i in range(1, rows + 1)]
+    with_checks = [
+        dict(employee, checks=checks[:CHECKS_PER_EMPLOYEE])
+        for employee in employees[:rows // CHECKS_PER_EMPLOYEE or 1]
+    ]
+    return {
+        'GET /checks': {'success': True, 'checks': checks,
+                        'total_checks': rows, 'next_cursor': 'MTAwMA'},
+        'GET /employees': {'success': True, 'employees': employees,
+                           'total_employees': rows, 'next_cursor': None},
+        'GET /employees?include=checks': {
+            'success': True, 'employees': with_checks,
+            'total_employees': len(with_checks), 'next_cursor': None}
+    }
+
+
+def bulk_body(rows):
+    return json.dumps({'employees': [
+        {'name': f'Synthetic Employee {i}'} for i in range(rows)]}).encode()
+
+
+def best_time(func, rounds):
+    func()
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    cases = payloads(args.rows)
+    body = bulk_body(args.rows)
+
+    for provider in available_providers():
+        app = Flask(__name__)
+        init_json_provider(app, provider)
+        init_request_metrics(app, RequestMetrics())
+
+        for name, payload in cases.items():
+            with app.test_request_context():
+                size = len(jsonify(payload).get_data())
+                best = best_time(lambda: jsonify(payload), args.rounds)
+            print(f'{provider.name:<8} jsonify  {name:<30} '
+                  f'{best * 1e3:>8.2f} ms {size / best / 2 ** 20:>8.1f} MiB/s')
+
+        # What request.get_json() does with the body once it is read.
+        with app.test_request_context():
+            best = best_time(lambda: flask_json.loads(body), args.rounds)
+        print(f'{provider.name:<8} get_json {"POST /employees/bulk":<30} '
+              f'{best * 1e3:>8.2f} ms '
+              f'{len(body) / best / 2 ** 20:>8.1f} MiB/s')
+
+
+if __name__ == '__main__':
+    main()
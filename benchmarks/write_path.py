@@ -0,0 +1,66 @@
+"""Compare PATCH/DELETE write latency before and after single-statement writes.
+
+`orm` is the previous handler body (Employee.query.get, mutate, commit);
+`core` is the single UPDATE/DELETE ... RETURNING id now used:
+
+    python -m benchmarks.write_path --employees 1000
+"""
+import argparse
+import time
+from benchmarks.common import benchmark_app
+from models import db, Employee
+from queries import delete_employee_by_id, insert_employees, rename_employee
+
+
+def orm_patch(employee_id):
+    employee = Employee.query.get(employee_id)
+    employee.name = 'Renamed'
+    db.session.add(employee)
+    db.session.commit()
+
+
+def core_patch(employee_id):
+    rename_employee(employee_id, 'Renamed')
+    db.session.commit()
+
+
+def orm_delete(employee_id):
+    db.session.delete(Employee.query.get(employee_id))
+    db.session.commit()
+
+
+def core_delete(employee_id):
+    delete_employee_by_id(employee_id)
+    db.session.commit()
+
+
+def measure(label, write, count):
+    ids = insert_employees([f'Benchmark Employee {i}' for i in range(count)])
+    db.session.commit()
+    db.session.remove()
+
+    start = time.perf_counter()
+    for employee_id in ids:
+        write(employee_id)
+        db.session.remove()
+    elapsed = time.perf_counter() - start
+
+    print(f'{label:<12} {elapsed / count * 1e6:>9.1f} us/write')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = benchmark_app()
+    with app.app_context():
+        for label, write in (('orm patch', orm_patch),
+                             ('core patch', core_patch),
+                             ('orm delete', orm_delete),
+                             ('core delete', core_delete)):
+            measure(label, write, args.employees)
+
+
+if __name__ == '__main__':
+    main()
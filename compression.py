@@ -0,0 +1,170 @@
+"""Accept-Encoding negotiated compression of API responses.
+
+gzip is always available; brotli (`br`) and zstd are offered when the
+`brotli` and `zstandard` packages are installed.
+"""
+import gzip
+import os
+import zlib
+from flask import g, request
+from response_cache import response_cache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Preferred first when the client accepts several equally.
+COMPRESS_ENCODINGS = [
+    name.strip() for name in
+    os.environ.get('COMPRESS_ENCODINGS', 'zstd,br,gzip').split(',')
+    if name.strip()
+]
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+COMPRESS_ZSTD_LEVEL = int(os.environ.get('COMPRESS_ZSTD_LEVEL', 3))
+# Server-sent events are left alone: each event is tiny and must reach the
+# client at once.
+COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson',
+                      'text/plain')
+
+
+class GzipCodec:
+    name = 'gzip'
+
+    def __init__(self, level=COMPRESS_GZIP_LEVEL):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, self.level, mtime=0)
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + \
+                compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class BrotliCodec:
+    name = 'br'
+
+    def __init__(self, quality=COMPRESS_BROTLI_QUALITY):
+        if brotli is None:
+            raise ImportError('The br encoding requires `brotli`.')
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class ZstdCodec:
+    name = 'zstd'
+
+    def __init__(self, level=COMPRESS_ZSTD_LEVEL):
+        if zstandard is None:
+            raise ImportError('The zstd encoding requires `zstandard`.')
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def stream(self, chunks):
+        compressor = self.compressor.compressobj()
+        for chunk in chunks:
+            yield compressor.compress(chunk) + \
+                compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+
+CODECS = {
+    GzipCodec.name: GzipCodec,
+    BrotliCodec.name: BrotliCodec,
+    ZstdCodec.name: ZstdCodec
+}
+
+
+def available_codecs(names=COMPRESS_ENCODINGS):
+    """Codecs for `names`, in order, skipping those not installed."""
+    codecs = []
+    for name in names:
+        if name not in CODECS:
+            raise ValueError(f'Unknown content encoding: {name}')
+        try:
+            codecs.append(CODECS[name]())
+        except ImportError:
+            pass
+    return codecs
+
+
+def _compressible(response):
+    return response.mimetype in COMPRESS_MIMETYPES and \
+        200 <= response.status_code < 300 and \
+        response.status_code not in (204, 206) and \
+        'Content-Encoding' not in response.headers
+
+
+def _compress_cached(codec, body):
+    """Compress `body`, reusing and keeping the bytes alongside its entry
+    when it is the response cache's body for this request.
+    """
+    key, entry = g.get('cached_response', (None, None))
+    if entry is None or entry.body != body:
+        return codec.compress(body)
+    data = entry.encodings.get(codec.name)
+    if data is None:
+        data = codec.compress(body)
+        response_cache.add_encoding(key, entry, codec.name, data)
+    return data
+
+
+def init_compression(app, codecs=None, min_size=COMPRESS_MIN_SIZE):
+    """Compress JSON, NDJSON and text responses of at least `min_size`
+    bytes with the best of `codecs` (default: COMPRESS_ENCODINGS) the
+    client accepts.  Streamed responses are compressed chunk by chunk,
+    flushing after each one, whatever their size.
+    """
+    if codecs is None:
+        codecs = available_codecs()
+    by_name = {codec.name: codec for codec in codecs}
+
+    @app.after_request
+    def compress_response(response):
+        if not codecs or not _compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(list(by_name))
+        if encoding is None or request.method == 'HEAD':
+            return response
+        codec = by_name[encoding]
+
+        if response.is_streamed:
+            original = response.response
+            response.response = codec.stream(response.iter_encoded())
+            response.call_on_close(getattr(original, 'close', lambda: None))
+        else:
+            body = response.get_data()
+            if len(body) < min_size:
+                return response
+            response.set_data(_compress_cached(codec, body))
+
+        response.headers['Content-Encoding'] = encoding
+        # The same ETag now names each encoding's bytes, so it is weak.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
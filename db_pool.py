@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+from metrics import Histogram
+
+
+def env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', 'true')
+DB_PGBOUNCER = env_flag('DB_PGBOUNCER', 'false')
+
+# Seconds spent waiting for a connection, including connecting a new one.
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+class InstrumentedPool:
+    """Pool mixin recording checkout wait times, timeouts and
+    invalidations (e.g. connections found dead by pre-ping).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram(POOL_WAIT_BUCKETS)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self._in_use = 0
+        self._counter_lock = threading.Lock()
+        event.listen(self, 'invalidate', self._count_invalidation)
+
+    def _count_invalidation(self, dbapi_connection, connection_record,
+                            exception):
+        with self._counter_lock:
+            self.invalidations += 1
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self._counter_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+        with self._counter_lock:
+            self.checkouts += 1
+            self._in_use += 1
+        return connection
+
+    def _do_return_conn(self, conn):
+        with self._counter_lock:
+            self._in_use -= 1
+        super()._do_return_conn(conn)
+
+    def stats(self):
+        overflow = self.overflow() if hasattr(self, 'overflow') else 0
+        return {
+            'pool': type(self).__name__,
+            'size': self.size() if hasattr(self, 'size') else None,
+            'checked_out': self._in_use,
+            'overflow': max(overflow, 0),
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'invalidations': self.invalidations,
+            'wait_time': self.wait_time.snapshot()
+        }
+
+
+class InstrumentedQueuePool(InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(InstrumentedPool, NullPool):
+    pass
+
+
+def engine_options(database_path, pgbouncer=DB_PGBOUNCER):
+    """create_engine() options for `database_path` from the DB_* settings.
+
+    SQLite keeps the pool Flask-SQLAlchemy picks for it.  In PgBouncer
+    mode PgBouncer does the pooling, so connections are not held between
+    requests; psycopg2 sends every statement as a simple query, never as a
+    server-side prepared statement, so it is safe with transaction pooling.
+    """
+    if make_url(database_path).get_backend_name() == 'sqlite':
+        return {}
+
+    options = {
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE
+    }
+    if pgbouncer:
+        options['poolclass'] = InstrumentedNullPool
+    else:
+        options.update({
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT
+        })
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if isinstance(pool, InstrumentedPool):
+        return pool.stats()
+    return {'pool': type(pool).__name__, 'status': pool.status()}
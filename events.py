@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import deque
+from flask import current_app
+from sqlalchemy import func, select
+from json_provider import json_provider
+from models import db, Change
+from queries import changes_since
+
+STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL', 1))
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', 15))
+STREAM_BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER_SIZE', 1000))
+STREAM_BATCH_SIZE = 500
+STREAM_RETRY_MS = 3000
+
+
+def format_event(change):
+    data = json_provider.dumps({
+        'id': change['id'],
+        'op': change['op'],
+        'data': change['data']
+    })
+    return f"id: {change['seq']}\nevent: {change['op']}\ndata: {data}\n\n"
+
+
+class ChangeFeed:
+    """Fans committed change log entries out to server-sent event streams.
+
+    One background thread per process polls the changes table and keeps
+    the most recent entries in memory; every subscriber waits on the same
+    buffer, so the database sees one poll per interval however many
+    streams are open.  Subscribers that fall behind the buffer, or resume
+    from an old Last-Event-ID, catch up from the changes table directly.
+    """
+
+    def __init__(self, table_names, interval=STREAM_POLL_INTERVAL,
+                 buffer_size=STREAM_BUFFER_SIZE):
+        self.table_names = list(table_names)
+        self.interval = interval
+        self.polls = 0
+        self._changes = deque(maxlen=buffer_size)
+        self._last_seq = None
+        # Every entry with a seq above _floor (and up to _last_seq) is in
+        # the buffer; older entries must be read from the changes table.
+        self._floor = None
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self, app):
+        with self._condition:
+            if self._thread is not None:
+                return
+            with app.app_context():
+                self._last_seq = db.session.execute(
+                    select(func.coalesce(func.max(Change.seq), 0))).scalar()
+                self._floor = self._last_seq
+                db.session.remove()
+            self._thread = threading.Thread(target=self._run, args=(app,),
+                                            daemon=True)
+            self._thread.start()
+
+    def _poll(self):
+        changes, next_since, has_more = changes_since(
+            self._last_seq, STREAM_BATCH_SIZE, self.table_names)
+        self.polls += 1
+        with self._condition:
+            overflow = len(self._changes) + len(changes) - \
+                self._changes.maxlen
+            if overflow > 0:
+                evicted = (list(self._changes) + changes)[overflow - 1]
+                self._floor = evicted['seq']
+            self._changes.extend(changes)
+            self._last_seq = next_since
+            self._condition.notify_all()
+        return has_more
+
+    def _run(self, app):
+        while True:
+            has_more = False
+            with app.app_context():
+                try:
+                    has_more = self._poll()
+                except Exception:
+                    app.logger.exception('Change feed poll failed')
+                finally:
+                    db.session.remove()
+            if not has_more:
+                time.sleep(self.interval)
+
+    def wait(self, after_seq, timeout):
+        """Block until entries after `after_seq` arrive or `timeout` passes.
+
+        Returns (changes, complete); `complete` is False when entries
+        after `after_seq` have already left the buffer.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._last_seq > after_seq, timeout)
+            changes = [change for change in self._changes
+                       if change['seq'] > after_seq]
+            return changes, after_seq >= self._floor
+
+    def stream(self, after_seq=None, expires_at=None,
+               heartbeat=STREAM_HEARTBEAT):
+        """Yield text/event-stream chunks, starting after `after_seq`.
+
+        The stream ends at `expires_at` (the token's exp) so a client must
+        reconnect, and re-authenticate, with its Last-Event-ID.
+        """
+        self.start(current_app._get_current_object())
+        if after_seq is None:
+            after_seq = self._last_seq
+
+        yield f'retry: {STREAM_RETRY_MS}\n\n'
+        while expires_at is None or time.time() < expires_at:
+            changes, complete = self.wait(after_seq, heartbeat)
+
+            if not complete:
+                changes, _, _ = changes_since(
+                    after_seq, STREAM_BATCH_SIZE, self.table_names)
+                db.session.remove()
+
+            if not changes:
+                yield ': heartbeat\n\n'
+                continue
+
+            for change in changes:
+                yield format_event(change)
+                after_seq = change['seq']
+
+
+check_feed = ChangeFeed(['checks'])
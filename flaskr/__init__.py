@@ -1,49 +1,244 @@
 from urllib.request import urlopen
-from flask import Flask, jsonify, abort, request
+from flask import Flask, Response, jsonify, abort, request, \
+    stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import json
 from models import setup_db, Check, Employee
-from auth import AuthError, requires_auth
+from auth import AuthError, requires_auth, token_cache
+from compression import init_compression
+from db_pool import pool_stats
+from events import check_feed
+from json_provider import init_json_provider
+from metrics import stats_exposition
+from query_stats import init_query_stats
+from replicas import use_replica
+from request_metrics import init_request_metrics, request_metrics
+from queries import MAX_BULK_SIZE, change_log_floor, changes_since, \
+    check_counts, count_mode, count_rows, delete_employee_by_id, \
+    delete_employees, embedded_checks, insert_employees, keyset_rows, \
+    page_args, page_limit, rename_employee, stream_rows, total_checks, \
+    update_employee_names
+from streaming import EXPORT_BATCH_SIZE, EXPORT_MIMETYPES, export_chunks
+from response_cache import cached_list, response_cache
+
+
+def is_valid_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def employee_list_tables(args):
+    if args.get('include'):
+        return ('employees', 'checks')
+    return ('employees',)
+
+
+def bulk_results(ids, succeeded, status):
+    return [{
+        'id': employee_id,
+        'status': status if employee_id in succeeded else 'not_found'
+    } for employee_id in ids]
 
 
 def create_app(test_config=None):
     app = Flask(__name__)
     db = setup_db(app)
+    init_query_stats(app)
+    init_json_provider(app)
+    init_request_metrics(app)
+    # Registered last, so it runs first and the compression is timed.
+    init_compression(app)
 
     @app.route('/', methods=['GET'])
     def index():
         return "Hello Capstone!"
 
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        text = request_metrics.exposition() + \
+            stats_exposition('response_cache', response_cache.stats()) + \
+            stats_exposition('token_cache', token_cache.stats())
+        return Response(text, mimetype='text/plain; version=0.0.4')
+
+    @app.route('/pool', methods=['GET'])
+    def pool():
+        return jsonify({
+            'success': True,
+            'pool': pool_stats(db.engine),
+            'replicas': [
+                dict(pool_stats(replica.engine), lag=replica.lag())
+                for replica in app.extensions['replicas'].replicas
+            ]
+        })
+
     @app.route('/checks', methods=['GET'])
     @requires_auth('read:checks')
+    @cached_list(('checks',))
+    @use_replica(('checks',))
     def all_checks(permissions):
         try:
-            all_checks = Check.query.order_by(Check.id).all()
-
-            all_checks_formatted = [check.format() for check in all_checks]
+            limit, after_id = page_args(request.args)
+            mode = count_mode(request.args)
+            all_checks_formatted, next_cursor = \
+                keyset_rows(Check, after_id, limit)
 
             return jsonify({
                 'success': True,
                 'checks': all_checks_formatted,
-                'total_checks': len(all_checks_formatted)
+                'total_checks': count_rows(Check, mode, total_checks),
+                'next_cursor': next_cursor
              })
         except Exception:
             abort(400)
 
+    @app.route('/checks/summary', methods=['GET'])
+    @requires_auth('read:checks')
+    @cached_list(('checks',))
+    @use_replica(('checks',))
+    def checks_summary(permissions):
+        try:
+            summary = check_counts()
+
+            return jsonify({
+                'success': True,
+                'summary': summary,
+                'total_checks': sum(row['check_count'] for row in summary)
+            })
+        except Exception:
+            abort(400)
+
+    @app.route('/checks/stream', methods=['GET'])
+    @requires_auth('read:checks')
+    def stream_checks(permissions):
+        last_event_id = request.headers.get(
+            'Last-Event-ID', request.args.get('last_event_id'))
+
+        try:
+            after_seq = int(last_event_id) if last_event_id else None
+        except ValueError:
+            abort(400)
+
+        # Entries after an older id may have been pruned.
+        if after_seq is not None and after_seq < change_log_floor():
+            abort(410)
+
+        return Response(
+            stream_with_context(
+                check_feed.stream(after_seq, permissions.get('exp'))),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+    @app.route('/checks/export', methods=['GET'])
+    @requires_auth('read:checks')
+    @use_replica(('checks',))
+    def export_checks(permissions):
+        export_format = request.args.get('format', 'json')
+
+        if export_format not in EXPORT_MIMETYPES:
+            abort(400)
+
+        rows = stream_rows(Check, EXPORT_BATCH_SIZE)
+
+        return Response(
+            stream_with_context(export_chunks(export_format, 'checks', rows)),
+            mimetype=EXPORT_MIMETYPES[export_format]
+        )
+
     @app.route('/employees', methods=['GET'])
     @requires_auth('read:employees')
+    @cached_list(employee_list_tables)
+    @use_replica(employee_list_tables)
     def all_employees(permissions):
+        include = request.args.get('include')
+        if include not in (None, 'checks'):
+            abort(400)
+        if include == 'checks' and \
+                'read:checks' not in permissions.get('permissions', []):
+            abort(403)
+
         try:
-            all_employees = Employee.query.order_by(Employee.id).all()
+            limit, after_id = page_args(request.args)
+            mode = count_mode(request.args)
 
-            all_employees_formatted = \
-                [employee.format() for employee in all_employees]
+            all_employees_formatted, next_cursor = \
+                keyset_rows(Employee, after_id, limit)
+
+            if include == 'checks':
+                # One SELECT for the whole page instead of a lazy load per
+                # employee, capped so one busy employee can't bloat it.
+                checks = embedded_checks(
+                    [employee['id'] for employee in all_employees_formatted])
+                for employee in all_employees_formatted:
+                    employee['checks'], employee['checks_next_cursor'] = \
+                        checks[employee['id']]
 
             return jsonify({
                 'success': True,
                 'employees': all_employees_formatted,
-                'total_employees': len(all_employees_formatted)
+                'total_employees':
+                    count_rows(Employee, mode, Employee.query.count),
+                'next_cursor': next_cursor
+            })
+        except Exception:
+            abort(400)
+
+    @app.route('/changes', methods=['GET'])
+    @requires_auth('read:employees')
+    @use_replica(('employees', 'checks'))
+    def changes(permissions):
+        try:
+            since = int(request.args.get('since', 0))
+            limit = page_limit(request.args)
+            # Entries after an older `since` may have been pruned.
+            floor = change_log_floor()
+            if since < floor:
+                return jsonify({
+                    'success': False,
+                    'error': 410,
+                    'message': 'Gone',
+                    'oldest_since': floor
+                }), 410
+
+            table_names = ['employees']
+            if 'read:checks' in permissions.get('permissions', []):
+                table_names.append('checks')
+
+            all_changes, next_since, has_more = \
+                changes_since(since, limit, table_names)
+
+            return jsonify({
+                'success': True,
+                'changes': all_changes,
+                'next_since': next_since,
+                'has_more': has_more
+            })
+        except Exception:
+            abort(400)
+
+    @app.route('/employees/<int:employee_id>/checks', methods=['GET'])
+    @requires_auth('read:checks')
+    @cached_list(('employees', 'checks'))
+    @use_replica(('employees', 'checks'))
+    def employee_checks(permissions, employee_id):
+        if Employee.query.with_entities(Employee.id) \
+                .filter(Employee.id == employee_id).scalar() is None:
+            abort(404)
+
+        try:
+            limit, after_id = page_args(request.args)
+            checks, next_cursor = keyset_rows(
+                Check, after_id, limit, Check.employee_id == employee_id)
+
+            return jsonify({
+                'success': True,
+                'employee_id': employee_id,
+                'checks': checks,
+                'total_checks': total_checks(employee_id),
+                'next_cursor': next_cursor
             })
         except Exception:
             abort(400)
@@ -52,12 +247,9 @@ def create_app(test_config=None):
     @requires_auth('delete:employees')
     def delete_employee(permissions, employee_id):
         try:
-            deleted_employee = Employee.query.get(employee_id)
-
-            if not deleted_employee:
+            if not delete_employee_by_id(employee_id):
                 abort(404)
 
-            db.session.delete(deleted_employee)
             db.session.commit()
 
             return jsonify({
@@ -65,7 +257,8 @@ def create_app(test_config=None):
                 'id': employee_id
             })
         except Exception as e:
-            if e.code == 404:
+            db.session.rollback()
+            if getattr(e, 'code', None) == 404:
                 abort(404)
             abort(400)
 
@@ -94,15 +287,108 @@ def create_app(test_config=None):
         except Exception:
             abort(400)
 
-    @app.route('/employees/<int:employee_id>', methods=['PATCH'])
+    @app.route('/employees/bulk', methods=['POST'])
+    @requires_auth('create:employees')
+    def post_employees_bulk(permissions):
+        data = request.get_json(silent=True)
+        employees = data.get('employees') if isinstance(data, dict) else None
+
+        if not isinstance(employees, list) or not employees:
+            abort(400)
+
+        if len(employees) > MAX_BULK_SIZE:
+            abort(422)
+
+        names = [employee.get('name') if isinstance(employee, dict) else None
+                 for employee in employees]
+
+        if not all(isinstance(name, str) and name for name in names):
+            abort(400)
+
+        try:
+            ids = insert_employees(names)
+            db.session.commit()
+
+            return jsonify({
+                'success': True,
+                'ids': ids,
+                'total_created': len(ids)
+            })
+        except Exception:
+            db.session.rollback()
+            abort(400)
+
+    @app.route('/employees/bulk', methods=['PATCH'])
     @requires_auth('update:employees')
-    def patch_employee(permissions, employee_id):
+    def patch_employees_bulk(permissions):
+        data = request.get_json(silent=True)
+        employees = data.get('employees') if isinstance(data, dict) else None
+
+        if not isinstance(employees, list) or not employees:
+            abort(400)
+
+        if len(employees) > MAX_BULK_SIZE:
+            abort(422)
+
+        if not all(isinstance(employee, dict) for employee in employees):
+            abort(400)
+
+        updates = [(employee.get('id'), employee.get('name'))
+                   for employee in employees]
+        ids = [employee_id for employee_id, _ in updates]
+
+        if len(set(ids)) != len(ids) or not all(
+                is_valid_id(employee_id) and isinstance(name, str) and name
+                for employee_id, name in updates):
+            abort(400)
+
         try:
-            employee_to_update = Employee.query.get(int(employee_id))
+            updated = update_employee_names(updates)
+            db.session.commit()
 
-            if not employee_to_update:
-                abort(404)
+            return jsonify({
+                'success': True,
+                'results': bulk_results(ids, updated, 'updated'),
+                'total_updated': len(updated)
+            })
+        except Exception:
+            db.session.rollback()
+            abort(400)
+
+    @app.route('/employees/bulk', methods=['DELETE'])
+    @requires_auth('delete:employees')
+    def delete_employees_bulk(permissions):
+        data = request.get_json(silent=True)
+        ids = data.get('ids') if isinstance(data, dict) else None
+
+        if not isinstance(ids, list) or not ids:
+            abort(400)
+
+        if len(ids) > MAX_BULK_SIZE:
+            abort(422)
 
+        if not all(is_valid_id(employee_id) for employee_id in ids):
+            abort(400)
+
+        ids = list(dict.fromkeys(ids))
+
+        try:
+            deleted = delete_employees(ids)
+            db.session.commit()
+
+            return jsonify({
+                'success': True,
+                'results': bulk_results(ids, deleted, 'deleted'),
+                'total_deleted': len(deleted)
+            })
+        except Exception:
+            db.session.rollback()
+            abort(400)
+
+    @app.route('/employees/<int:employee_id>', methods=['PATCH'])
+    @requires_auth('update:employees')
+    def patch_employee(permissions, employee_id):
+        try:
             data = request.get_json()
 
             name = data.get('name', None)
@@ -110,8 +396,9 @@ def create_app(test_config=None):
             if not name:
                 abort(400)
 
-            employee_to_update.name = name
-            db.session.add(employee_to_update)
+            if not rename_employee(employee_id, name):
+                abort(404)
+
             db.session.commit()
 
             return jsonify({
@@ -119,7 +406,8 @@ def create_app(test_config=None):
                 'id': employee_id
             })
         except Exception as e:
-            if e.code == 404:
+            db.session.rollback()
+            if getattr(e, 'code', None) == 404:
                 abort(404)
             abort(400)
 
@@ -147,6 +435,14 @@ def create_app(test_config=None):
             "message": "Not Found"
         }), 404
 
+    @app.errorhandler(410)
+    def gone(error):
+        return jsonify({
+            "success": False,
+            "error": 410,
+            "message": "Gone"
+        }), 410
+
     @app.errorhandler(401)
     def auth_error_401(error):
         return jsonify({
@@ -0,0 +1,118 @@
+"""JSON encoding for API responses, request bodies and streamed items.
+
+JSON_PROVIDER picks the implementation: `auto` (default; orjson when it is
+installed, else the standard library), `orjson` or `stdlib`.
+"""
+import json
+import os
+from flask.json import JSONDecoder, JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+
+class StdlibProvider:
+    """The standard library json module, Flask's own encoder."""
+
+    name = 'stdlib'
+
+    def dumps(self, obj, default=None, sort_keys=False, indent=None):
+        separators = (',', ':') if indent is None else (',', ': ')
+        return json.dumps(obj, default=default, sort_keys=sort_keys,
+                          indent=indent, separators=separators)
+
+    def loads(self, s):
+        return json.loads(s)
+
+
+class OrjsonProvider:
+    """orjson, several times faster than the json module on large lists.
+
+    Non-ASCII text is written as UTF-8 rather than \\u escapes.  Dates and
+    dataclasses are left to `default`, so Flask's encoder formats them as
+    it always has.
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('The orjson JSON provider requires `orjson`.')
+        self.options = orjson.OPT_NON_STR_KEYS | \
+            orjson.OPT_PASSTHROUGH_DATETIME | \
+            orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumps(self, obj, default=None, sort_keys=False, indent=None):
+        options = self.options
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent is not None:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=options).decode()
+
+    def loads(self, s):
+        return orjson.loads(s)
+
+
+PROVIDERS = {
+    StdlibProvider.name: StdlibProvider,
+    OrjsonProvider.name: OrjsonProvider
+}
+
+
+def get_provider(name):
+    if name == 'auto':
+        name = OrjsonProvider.name if orjson is not None \
+            else StdlibProvider.name
+    if name not in PROVIDERS:
+        raise ValueError(f'Unknown JSON provider: {name}')
+    return PROVIDERS[name]()
+
+
+def available_providers():
+    providers = []
+    for name in PROVIDERS:
+        try:
+            providers.append(get_provider(name))
+        except ImportError:
+            pass
+    return providers
+
+
+json_provider = get_provider(JSON_PROVIDER)
+
+
+class ProviderJSONEncoder(JSONEncoder):
+    """Flask's encoder with the encoding done by `provider`.  Flask's
+    default() still handles the types the provider leaves to it.
+    """
+
+    provider = json_provider
+
+    def encode(self, o):
+        return self.provider.dumps(o, default=self.default,
+                                   sort_keys=self.sort_keys,
+                                   indent=self.indent)
+
+
+class ProviderJSONDecoder(JSONDecoder):
+    provider = json_provider
+
+    def decode(self, s, *args):
+        return self.provider.loads(s)
+
+
+def init_json_provider(app, provider=json_provider):
+    """Encode jsonify() responses and decode request.get_json() bodies with
+    `provider`.  The stdlib provider keeps Flask's own encoder and decoder.
+    """
+    if provider.name == StdlibProvider.name:
+        return
+    app.json_encoder = type('ProviderJSONEncoder', (ProviderJSONEncoder,),
+                            {'provider': provider})
+    app.json_decoder = type('ProviderJSONDecoder', (ProviderJSONDecoder,),
+                            {'provider': provider})
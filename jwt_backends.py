@@ -0,0 +1,140 @@
+import base64
+import binascii
+import json
+import time
+from jose import jwk, jwt
+from jose.exceptions import JWTError
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding, rsa
+except ImportError:  # pragma: no cover - optional dependency
+    rsa = None
+
+
+def _b64decode(segment):
+    if isinstance(segment, str):
+        segment = segment.encode()
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+def _b64_to_int(value):
+    return int.from_bytes(_b64decode(value), 'big')
+
+
+class JoseBackend:
+    """Verifies tokens with python-jose, the original implementation."""
+
+    name = 'jose'
+
+    def load_key(self, key):
+        return jwk.construct(key, key.get('alg', 'RS256'))
+
+    def decode(self, token, key, algorithms, audience, issuer):
+        return jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=audience,
+            issuer=issuer
+        )
+
+
+class CryptographyBackend:
+    """Verifies RS256 tokens with pyca/cryptography directly.
+
+    Raises the same python-jose exceptions as JoseBackend so callers do not
+    need to know which backend is active.
+    """
+
+    name = 'cryptography'
+    hash_algorithms = {
+        'RS256': 'SHA256',
+        'RS384': 'SHA384',
+        'RS512': 'SHA512'
+    }
+
+    def __init__(self):
+        if rsa is None:
+            raise ImportError(
+                'The cryptography JWT backend requires `cryptography`.')
+
+    def load_key(self, key):
+        numbers = rsa.RSAPublicNumbers(_b64_to_int(key['e']),
+                                       _b64_to_int(key['n']))
+        return numbers.public_key()
+
+    def decode(self, token, key, algorithms, audience, issuer):
+        try:
+            signing_input, signature = token.encode().rsplit(b'.', 1)
+            header_segment, payload_segment = signing_input.split(b'.', 1)
+            header = json.loads(_b64decode(header_segment))
+            claims = json.loads(_b64decode(payload_segment))
+            signature = _b64decode(signature)
+        except (ValueError, TypeError, binascii.Error):
+            raise JWTError('Error decoding token.')
+
+        alg = header.get('alg')
+        if alg not in algorithms or alg not in self.hash_algorithms:
+            raise JWTError('The specified alg value is not allowed')
+
+        hash_algorithm = getattr(hashes, self.hash_algorithms[alg])()
+        try:
+            key.verify(signature, signing_input, padding.PKCS1v15(),
+                       hash_algorithm)
+        except InvalidSignature:
+            raise JWTError('Signature verification failed.')
+
+        self.validate_claims(claims, audience, issuer)
+        return claims
+
+    @staticmethod
+    def validate_claims(claims, audience, issuer):
+        now = time.time()
+
+        if 'exp' in claims:
+            if not isinstance(claims['exp'], (int, float)):
+                raise jwt.JWTClaimsError('Expiration Time claim (exp) '
+                                         'must be an integer.')
+            if claims['exp'] < now:
+                raise jwt.ExpiredSignatureError('Signature has expired.')
+
+        if 'nbf' in claims:
+            if not isinstance(claims['nbf'], (int, float)):
+                raise jwt.JWTClaimsError('Not Before claim (nbf) '
+                                         'must be an integer.')
+            if claims['nbf'] > now:
+                raise jwt.JWTClaimsError('The token is not yet valid (nbf)')
+
+        if audience is not None:
+            audiences = claims.get('aud')
+            if isinstance(audiences, str):
+                audiences = [audiences]
+            if not isinstance(audiences, list) or audience not in audiences:
+                raise jwt.JWTClaimsError('Invalid audience')
+
+        if issuer is not None and claims.get('iss') != issuer:
+            raise jwt.JWTClaimsError('Invalid issuer')
+
+
+BACKENDS = {
+    JoseBackend.name: JoseBackend,
+    CryptographyBackend.name: CryptographyBackend
+}
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown JWT backend: {name}')
+    return BACKENDS[name]()
+
+
+def available_backends():
+    backends = []
+    for name in BACKENDS:
+        try:
+            backends.append(get_backend(name))
+        except ImportError:
+            pass
+    return backends
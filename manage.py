@@ -2,7 +2,10 @@ from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
 
 from flaskr import create_app
-from models import setup_db
+from models import CHANGE_LOG_MAX_ROWS, CHANGE_LOG_RETENTION_DAYS, \
+    prune_changes, rebuild_check_counts, setup_db
+import synthetic
+from versions import touch
 
 app = create_app()
 db = setup_db(app)
@@ -13,5 +16,45 @@ manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
 
+@manager.command
+def rebuild_check_summary():
+    """Recompute employee_check_counts from the checks table."""
+    rebuild_check_counts(db.session.connection())
+    # /checks/summary is cached against the checks table's version.
+    touch(db.session, 'checks')
+    db.session.commit()
+
+
+@manager.option('--days', type=float, default=CHANGE_LOG_RETENTION_DAYS,
+                help='Drop entries older than this many days (0: keep all)')
+@manager.option('--max-rows', dest='max_rows', type=int,
+                default=CHANGE_LOG_MAX_ROWS,
+                help='Keep at most this many newest entries (0: no limit)')
+def prune_change_log(days, max_rows):
+    """Drop old change log entries; run it periodically, e.g. daily."""
+    floor = prune_changes(db.session.connection(), days, max_rows)
+    db.session.commit()
+    if floor is None:
+        print('Nothing to prune')
+    else:
+        print(f'Pruned change log entries up to seq {floor}')
+
+
+@manager.option('--employees', type=int, default=1000,
+                help='Number of employees to add')
+@manager.option('--checks', type=int, default=100000,
+                help='Number of checks to add')
+@manager.option('--batch-size', dest='batch_size', type=int,
+                default=synthetic.GENERATE_BATCH_SIZE,
+                help='Rows per INSERT batch')
+@manager.option('--seed', type=int, default=0,
+                help='Random seed; the same seed gives the same data')
+def generate_data(employees, checks, batch_size, seed):
+    """Add synthetic employees and checks for load testing."""
+    added_employees, added_checks = synthetic.generate_data(
+        employees, checks, batch_size, seed)
+    print(f'Added {added_employees} employees and {added_checks} checks')
+
+
 if __name__ == '__main__':
     manager.run()
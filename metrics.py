@@ -0,0 +1,63 @@
+import bisect
+import threading
+
+
+class Histogram:
+    """Counts of observed values in cumulative `le` buckets, Prometheus
+    style; the last, implicit bucket is +Inf.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound), ...] ending with +Inf."""
+        with self._lock:
+            counts = list(self._counts)
+        total = 0
+        bounds = []
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            total += count
+            bounds.append((bound, total))
+        return bounds
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': {
+                '+Inf' if bound == float('inf') else str(bound): total
+                for bound, total in self.cumulative()
+            }
+        }
+
+
+COUNTER_STATS = ('hits', 'misses', 'evictions', 'invalidations')
+
+
+def stats_exposition(prefix, stats):
+    """A stats() dict in the Prometheus text exposition format: running
+    totals (COUNTER_STATS) as `<prefix>_<key>_total` counters, the rest as
+    `<prefix>_<key>` gauges.
+    """
+    lines = []
+    for key, value in stats.items():
+        if key in COUNTER_STATS:
+            name, kind = f'{prefix}_{key}_total', 'counter'
+        else:
+            name, kind = f'{prefix}_{key}', 'gauge'
+        lines.append(f'# TYPE {name} {kind}')
+        lines.append(f'{name} {value:g}' if isinstance(value, float)
+                     else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
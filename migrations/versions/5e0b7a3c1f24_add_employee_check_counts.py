@@ -0,0 +1,78 @@
+"""Add employee_check_counts summary table
+
+Revision ID: 5e0b7a3c1f24
+Revises: c41d8e2f9a06
+Create Date: 2026-10-18 10:03:17.554208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0b7a3c1f24'
+down_revision = 'c41d8e2f9a06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('employee_check_counts',
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('check_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'],
+                            ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('employee_id')
+    )
+    # Hold off check writes until the triggers are in place, so none is
+    # missed between the backfill and the first trigger run.
+    op.execute('LOCK TABLE checks IN SHARE ROW EXCLUSIVE MODE')
+    op.execute(
+        'INSERT INTO employee_check_counts (employee_id, check_count) '
+        'SELECT employee_id, COUNT(*) FROM checks GROUP BY employee_id'
+    )
+    op.execute("""
+        CREATE FUNCTION count_checks() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE employee_check_counts AS counts
+                SET check_count = counts.check_count - removed.check_count
+                FROM (SELECT employee_id, COUNT(*) AS check_count
+                      FROM old_checks GROUP BY employee_id) AS removed
+                WHERE counts.employee_id = removed.employee_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO employee_check_counts (employee_id, check_count)
+                SELECT employee_id, COUNT(*) FROM new_checks
+                GROUP BY employee_id
+                ON CONFLICT (employee_id) DO UPDATE
+                SET check_count = employee_check_counts.check_count
+                    + EXCLUDED.check_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER checks_count_insert AFTER INSERT ON checks
+        REFERENCING NEW TABLE AS new_checks
+        FOR EACH STATEMENT EXECUTE FUNCTION count_checks()
+    """)
+    op.execute("""
+        CREATE TRIGGER checks_count_update AFTER UPDATE ON checks
+        REFERENCING OLD TABLE AS old_checks NEW TABLE AS new_checks
+        FOR EACH STATEMENT EXECUTE FUNCTION count_checks()
+    """)
+    op.execute("""
+        CREATE TRIGGER checks_count_delete AFTER DELETE ON checks
+        REFERENCING OLD TABLE AS old_checks
+        FOR EACH STATEMENT EXECUTE FUNCTION count_checks()
+    """)
+
+
+def downgrade():
+    for name in ('checks_count_insert', 'checks_count_update',
+                 'checks_count_delete'):
+        op.execute(f'DROP TRIGGER {name} ON checks')
+    op.execute('DROP FUNCTION count_checks()')
+    op.drop_table('employee_check_counts')
@@ -0,0 +1,32 @@
+"""Add changes log for delta sync
+
+Revision ID: 9a2f6c0d4e18
+Revises: 5e0b7a3c1f24
+Create Date: 2026-10-18 11:26:52.918340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a2f6c0d4e18'
+down_revision = '5e0b7a3c1f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('changes',
+    sa.Column('seq', sa.BigInteger(), nullable=False),
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), server_default=sa.text('now()'),
+              nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+
+
+def downgrade():
+    op.drop_table('changes')
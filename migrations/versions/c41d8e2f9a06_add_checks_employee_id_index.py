@@ -0,0 +1,25 @@
+"""Add index on checks.employee_id
+
+Revision ID: c41d8e2f9a06
+Revises: 7b81dcc2e3f8
+Create Date: 2026-10-18 09:12:44.201733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d8e2f9a06'
+down_revision = '7b81dcc2e3f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_checks_employee_id', 'checks',
+                    ['employee_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_checks_employee_id', table_name='checks')
@@ -1,16 +1,37 @@
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, create_engine, event, func, inspect, select
+from datetime import datetime, timedelta
 import os
+from db_pool import engine_options
+from replicas import DATABASE_REPLICA_URLS, ReplicaSet, RoutingSQLAlchemy, \
+    replica_engine_options
 
-database_path = os.environ['DATABASE_URL']
-if database_path.startswith("postgres://"):
-    database_path = database_path.replace("postgres://", "postgresql://", 1)
 
-db = SQLAlchemy()
+def normalize_database_url(url):
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
 
 
-def setup_db(app, database_path=database_path):
+database_path = normalize_database_url(os.environ['DATABASE_URL'])
+# How long, and how many, change log entries prune_changes keeps; 0 means
+# no limit.
+CHANGE_LOG_RETENTION_DAYS = float(
+    os.environ.get('CHANGE_LOG_RETENTION_DAYS', 30))
+CHANGE_LOG_MAX_ROWS = int(os.environ.get('CHANGE_LOG_MAX_ROWS', 0))
+
+db = RoutingSQLAlchemy()
+
+
+def setup_db(app, database_path=database_path,
+             replica_paths=DATABASE_REPLICA_URLS):
     app.config['SQLALCHEMY_DATABASE_URI'] = database_path
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_path)
+    replica_paths = [normalize_database_url(path) for path in replica_paths]
+    app.extensions['replicas'] = ReplicaSet([
+        create_engine(path, **replica_engine_options(path))
+        for path in replica_paths
+    ])
     db.app = app
     db.init_app(app)
     #db.create_all()
@@ -19,11 +40,19 @@ def setup_db(app, database_path=database_path):
 
 class Check(db.Model):
     __tablename__ = 'checks'
+    __table_args__ = (
+        # Serves FK checks on employee delete and keyset pages of one
+        # employee's checks (employee_id = :id AND id > :after ORDER BY id).
+        db.Index('ix_checks_employee_id', 'employee_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'),
                             nullable=False)
 
+    # Columns returned by format(), in order; used by the Core read path.
+    format_columns = ('id', 'employee_id')
+
     def format(self):
         return {
             'id': self.id,
@@ -44,6 +73,8 @@ class Employee(db.Model):
     name = db.Column(db.String(), nullable=False)
     checks = db.relationship('Check', backref='employee')
 
+    format_columns = ('id', 'name')
+
     def __str__(self):
         return f'<Employee id=${self.id}, name=${self.name}>'
 
@@ -55,3 +86,240 @@ class Employee(db.Model):
             'id': self.id,
             'name': self.name
         }
+
+
+class Change(db.Model):
+    """Append-only log of row changes, read by GET /changes for delta sync.
+
+    `seq` increases in commit order: record_changes serializes writers on
+    PostgreSQL, so a client that has seen `seq` N never misses a change
+    numbered below N that commits later.  Old entries are dropped by
+    prune_changes (`python manage.py prune_change_log`).
+    """
+    __tablename__ = 'changes'
+
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'),
+                    primary_key=True)
+    table_name = db.Column(db.String(), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False,
+                           server_default=func.now())
+
+    def __repr__(self):
+        return f'<Change seq=${self.seq}, {self.op} ' \
+               f'{self.table_name} id=${self.row_id}>'
+
+    def format(self):
+        return {
+            'seq': self.seq,
+            'table': self.table_name,
+            'id': self.row_id,
+            'op': self.op
+        }
+
+
+# Arbitrary key for pg_advisory_xact_lock, held by change log writers until
+# their transaction ends.
+CHANGE_LOG_LOCK = 4404405
+
+
+def record_changes(connection, table_name, op, row_ids):
+    """Append one `op` ('insert', 'update' or 'delete') entry per row id.
+
+    ORM writes to Check and Employee are recorded by the mapper events
+    below; Core writes must call this in their own transaction.
+    """
+    if not row_ids:
+        return
+    if connection.dialect.name == 'postgresql':
+        connection.execute(select(func.pg_advisory_xact_lock(
+            CHANGE_LOG_LOCK)))
+    connection.execute(Change.__table__.insert(), [
+        {'table_name': table_name, 'row_id': row_id, 'op': op}
+        for row_id in row_ids
+    ])
+
+
+# The op of the entry prune_changes leaves at the seq of the newest entry
+# it dropped; see change_log_floor in queries.
+PRUNED = 'prune'
+
+
+def prune_changes(connection, retention_days=CHANGE_LOG_RETENTION_DAYS,
+                  max_rows=CHANGE_LOG_MAX_ROWS):
+    """Drop change log entries older than `retention_days` or beyond the
+    newest `max_rows` (0 for no limit); returns the new floor, or None if
+    there was nothing to drop.
+
+    A PRUNED entry takes the seq of the newest dropped one, so clients
+    asking for changes since an older seq can be told to resync.
+    """
+    table = Change.__table__
+    if connection.dialect.name == 'postgresql':
+        connection.execute(select(func.pg_advisory_xact_lock(
+            CHANGE_LOG_LOCK)))
+
+    cutoffs = []
+    if retention_days:
+        if connection.dialect.name == 'postgresql':
+            # changed_at is the database's now(), in its time zone.
+            oldest = func.now() - timedelta(days=retention_days)
+        else:
+            oldest = datetime.utcnow() - timedelta(days=retention_days)
+        cutoffs.append(connection.execute(
+            select(func.max(table.c.seq))
+            .where(table.c.changed_at < oldest)).scalar())
+    if max_rows:
+        cutoffs.append(connection.execute(
+            select(table.c.seq).order_by(table.c.seq.desc())
+            .offset(max_rows).limit(1)).scalar())
+    cutoffs = [cutoff for cutoff in cutoffs if cutoff is not None]
+    if not cutoffs:
+        return None
+
+    floor = max(cutoffs)
+    connection.execute(table.delete().where(table.c.seq <= floor))
+    connection.execute(table.insert().values(
+        seq=floor, table_name=Change.__tablename__, row_id=0, op=PRUNED))
+    return floor
+
+
+class EmployeeCheckCount(db.Model):
+    """Number of checks per employee, kept in step with the checks table.
+
+    Triggers on checks adjust it in the same transaction as every insert,
+    update or delete, whether it comes through the ORM, Core or psql (see
+    CHECK_COUNT_TRIGGERS below and migration 5e0b7a3c1f24).
+    `python manage.py rebuild_check_summary` recomputes it from scratch.
+    """
+    __tablename__ = 'employee_check_counts'
+
+    employee_id = db.Column(db.Integer,
+                            db.ForeignKey('employees.id', ondelete='CASCADE'),
+                            primary_key=True)
+    check_count = db.Column(db.Integer, nullable=False, default=0)
+
+    format_columns = ('employee_id', 'check_count')
+
+    def __repr__(self):
+        return f'<EmployeeCheckCount employee_id=${self.employee_id}, ' \
+               f'check_count=${self.check_count}>'
+
+    def format(self):
+        return {
+            'employee_id': self.employee_id,
+            'check_count': self.check_count
+        }
+
+
+def rebuild_check_counts(connection):
+    table = EmployeeCheckCount.__table__
+    checks = Check.__table__
+
+    connection.execute(table.delete())
+    connection.execute(table.insert().from_select(
+        ['employee_id', 'check_count'],
+        select(checks.c.employee_id, func.count())
+        .group_by(checks.c.employee_id)))
+
+
+# Keep employee_check_counts in step with checks.  PostgreSQL runs one
+# statement-level trigger per statement, so a bulk insert costs one upsert
+# per employee; the same function is created by migration 5e0b7a3c1f24.
+CHECK_COUNT_TRIGGERS = {
+    'postgresql': [
+        """
+        CREATE OR REPLACE FUNCTION count_checks() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE employee_check_counts AS counts
+                SET check_count = counts.check_count - removed.check_count
+                FROM (SELECT employee_id, COUNT(*) AS check_count
+                      FROM old_checks GROUP BY employee_id) AS removed
+                WHERE counts.employee_id = removed.employee_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO employee_check_counts (employee_id, check_count)
+                SELECT employee_id, COUNT(*) FROM new_checks
+                GROUP BY employee_id
+                ON CONFLICT (employee_id) DO UPDATE
+                SET check_count = employee_check_counts.check_count
+                    + EXCLUDED.check_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER checks_count_insert AFTER INSERT ON checks
+        REFERENCING NEW TABLE AS new_checks
+        FOR EACH STATEMENT EXECUTE FUNCTION count_checks()
+        """,
+        """
+        CREATE TRIGGER checks_count_update AFTER UPDATE ON checks
+        REFERENCING OLD TABLE AS old_checks NEW TABLE AS new_checks
+        FOR EACH STATEMENT EXECUTE FUNCTION count_checks()
+        """,
+        """
+        CREATE TRIGGER checks_count_delete AFTER DELETE ON checks
+        REFERENCING OLD TABLE AS old_checks
+        FOR EACH STATEMENT EXECUTE FUNCTION count_checks()
+        """
+    ],
+    # SQLite (tests, benchmarks) has row-level triggers only.
+    'sqlite': [
+        """
+        CREATE TRIGGER checks_count_insert AFTER INSERT ON checks
+        BEGIN
+            INSERT OR IGNORE INTO employee_check_counts
+                (employee_id, check_count) VALUES (NEW.employee_id, 0);
+            UPDATE employee_check_counts SET check_count = check_count + 1
+            WHERE employee_id = NEW.employee_id;
+        END
+        """,
+        """
+        CREATE TRIGGER checks_count_update AFTER UPDATE OF employee_id
+        ON checks WHEN OLD.employee_id != NEW.employee_id
+        BEGIN
+            UPDATE employee_check_counts SET check_count = check_count - 1
+            WHERE employee_id = OLD.employee_id;
+            INSERT OR IGNORE INTO employee_check_counts
+                (employee_id, check_count) VALUES (NEW.employee_id, 0);
+            UPDATE employee_check_counts SET check_count = check_count + 1
+            WHERE employee_id = NEW.employee_id;
+        END
+        """,
+        """
+        CREATE TRIGGER checks_count_delete AFTER DELETE ON checks
+        BEGIN
+            UPDATE employee_check_counts SET check_count = check_count - 1
+            WHERE employee_id = OLD.employee_id;
+        END
+        """
+    ]
+}
+
+# For db.create_all(); migrated databases get them from 5e0b7a3c1f24.
+for _dialect, _statements in CHECK_COUNT_TRIGGERS.items():
+    for _statement in _statements:
+        event.listen(Check.__table__, 'after_create',
+                     DDL(_statement).execute_if(dialect=_dialect))
+
+
+def _log_change(op):
+    def listener(mapper, connection, target):
+        if op == 'update':
+            # after_update also fires for flushed objects with no net change
+            state = inspect(target)
+            if not any(state.attrs[attr.key].history.has_changes()
+                       for attr in mapper.column_attrs):
+                return
+        record_changes(connection, mapper.local_table.name, op, [target.id])
+    return listener
+
+
+for _model in (Check, Employee):
+    event.listen(_model, 'after_insert', _log_change('insert'))
+    event.listen(_model, 'after_update', _log_change('update'))
+    event.listen(_model, 'after_delete', _log_change('delete'))
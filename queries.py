@@ -0,0 +1,387 @@
+import base64
+import json
+import os
+from sqlalchemy import Integer, String, any_, bindparam, column, func, \
+    select, text, values
+from sqlalchemy.dialects.postgresql import ARRAY
+from models import db, Change, Check, Employee, EmployeeCheckCount, \
+    PRUNED, record_changes
+from versions import touch
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
+MAX_BULK_SIZE = int(os.environ.get('MAX_BULK_SIZE', 500))
+EMBEDDED_CHECKS_LIMIT = int(os.environ.get('EMBEDDED_CHECKS_LIMIT', 10))
+COUNT_MODES = ('exact', 'estimated', 'none')
+
+
+def encode_cursor(last_id):
+    data = json.dumps({'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    data = cursor.encode() + b'=' * (-len(cursor) % 4)
+    last_id = json.loads(base64.urlsafe_b64decode(data))['id']
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError('Invalid cursor')
+    return last_id
+
+
+def page_limit(args):
+    limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def page_args(args):
+    """Return (limit, after_id) from the `limit` and `cursor` query args.
+
+    `limit` is clamped to MAX_PAGE_SIZE; malformed values raise ValueError.
+    """
+    limit = page_limit(args)
+
+    cursor = args.get('cursor')
+    after_id = decode_cursor(cursor) if cursor else 0
+    return limit, after_id
+
+
+def keyset_page(query, id_column, after_id, limit):
+    """Return (rows, next_cursor) for the page of `query` after `after_id`.
+
+    Uses `id > after_id ORDER BY id LIMIT n` so every page costs an index
+    range scan no matter how deep into the table it is.
+    """
+    rows = query.filter(id_column > after_id) \
+        .order_by(id_column) \
+        .limit(limit + 1) \
+        .all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
+
+
+def format_select(model):
+    """Core SELECT of just the columns `model.format()` returns."""
+    table = model.__table__
+    return select(*[table.c[name] for name in model.format_columns])
+
+
+def keyset_rows(model, after_id, limit, *criteria):
+    """Like keyset_page, but returns formatted dicts built from plain row
+    tuples, skipping ORM instances and identity-map bookkeeping.
+    """
+    id_column = model.__table__.c.id
+    stmt = format_select(model) \
+        .where(id_column > after_id, *criteria) \
+        .order_by(id_column) \
+        .limit(limit + 1)
+    rows = db.session.execute(stmt).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+
+    names = model.format_columns
+    return [dict(zip(names, row)) for row in rows], next_cursor
+
+
+def embedded_checks(employee_ids, limit=EMBEDDED_CHECKS_LIMIT):
+    """Return {employee_id: (checks, next_cursor)} with each employee's
+    first `limit` checks, in one statement for the whole page.
+
+    next_cursor, set when an employee has more, continues the list at
+    /employees/<id>/checks.
+    """
+    if not employee_ids:
+        return {}
+    table = Check.__table__
+    position = func.row_number().over(
+        partition_by=table.c.employee_id, order_by=table.c.id)
+    ranked = format_select(Check).add_columns(position.label('position')) \
+        .where(table.c.employee_id.in_(employee_ids)) \
+        .subquery()
+    names = Check.format_columns
+    stmt = select(*[ranked.c[name] for name in names]) \
+        .where(ranked.c.position <= limit + 1) \
+        .order_by(ranked.c.employee_id, ranked.c.id)
+
+    checks = {employee_id: [] for employee_id in employee_ids}
+    for row in db.session.execute(stmt):
+        checks[row.employee_id].append(dict(zip(names, row)))
+
+    embedded = {}
+    for employee_id, rows in checks.items():
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['id'])
+        embedded[employee_id] = (rows, next_cursor)
+    return embedded
+
+
+def stream_rows(model, batch_size):
+    """Yield every row of `model` as a formatted dict, ordered by id.
+
+    stream_results uses a server-side cursor where the driver supports it,
+    buffering at most `batch_size` rows at a time.
+    """
+    stmt = format_select(model) \
+        .order_by(model.__table__.c.id) \
+        .execution_options(stream_results=True, max_row_buffer=batch_size)
+    names = model.format_columns
+    for row in db.session.execute(stmt):
+        yield dict(zip(names, row))
+
+
+def count_mode(args):
+    mode = args.get('count', 'exact')
+    if mode not in COUNT_MODES:
+        raise ValueError(f'count must be one of {COUNT_MODES}')
+    return mode
+
+
+def estimated_count(model):
+    """Approximate row count without scanning the table.
+
+    PostgreSQL: the planner's `pg_class.reltuples` estimate, as refreshed
+    by VACUUM/ANALYZE.  Elsewhere (SQLite in tests): MAX(id), a single
+    index probe that ignores gaps left by deletes.  Returns None when no
+    estimate is available, e.g. for a table never analyzed.
+    """
+    table = model.__table__
+
+    if db.engine.dialect.name == 'postgresql':
+        stmt = text('SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = to_regclass(:table_name)')
+        estimate = db.session.execute(
+            stmt, {'table_name': table.name}).scalar()
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    return db.session.execute(select(func.max(table.c.id))).scalar() or 0
+
+
+def count_rows(model, mode, exact_count):
+    """Total for a list response: `exact_count()`, an estimate or None."""
+    if mode == 'none':
+        return None
+    if mode == 'estimated':
+        estimate = estimated_count(model)
+        if estimate is not None:
+            return estimate
+    return exact_count()
+
+
+SYNC_MODELS = {
+    Check.__tablename__: Check,
+    Employee.__tablename__: Employee
+}
+
+
+def change_log_floor():
+    """The oldest `since` changes_since can answer completely: 0 until the
+    log is first pruned, then the seq of the newest entry dropped.
+    """
+    table = Change.__table__
+    oldest = db.session.execute(
+        select(table.c.seq, table.c.op).order_by(table.c.seq).limit(1)) \
+        .first()
+    if oldest is None or oldest.op != PRUNED:
+        return 0
+    return oldest.seq
+
+
+def changes_since(since, limit, table_names):
+    """Change log entries after `since` for `table_names`, oldest first.
+
+    Inserts and updates carry the row's current `data` (None if it has
+    since been deleted; its tombstone follows later in the log).  Returns
+    (changes, next_since, has_more).
+    """
+    table = Change.__table__
+    stmt = select(table.c.seq, table.c.table_name, table.c.row_id,
+                  table.c.op) \
+        .where(table.c.seq > since, table.c.table_name.in_(table_names)) \
+        .order_by(table.c.seq) \
+        .limit(limit + 1)
+    rows = db.session.execute(stmt).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Current state of every inserted/updated row, one query per table.
+    wanted = {}
+    for row in rows:
+        if row.op != 'delete':
+            wanted.setdefault(row.table_name, set()).add(row.row_id)
+
+    current = {}
+    for table_name, ids in wanted.items():
+        model = SYNC_MODELS[table_name]
+        names = model.format_columns
+        stmt = format_select(model).where(model.__table__.c.id.in_(ids))
+        for row in db.session.execute(stmt):
+            current[(table_name, row.id)] = dict(zip(names, row))
+
+    changes = [{
+        'seq': row.seq,
+        'table': row.table_name,
+        'id': row.row_id,
+        'op': row.op,
+        'data': current.get((row.table_name, row.row_id))
+        if row.op != 'delete' else None
+    } for row in rows]
+
+    next_since = rows[-1].seq if rows else since
+    return changes, next_since, has_more
+
+
+def check_counts():
+    """Per-employee check counts from the summary table, by employee id."""
+    table = EmployeeCheckCount.__table__
+    stmt = format_select(EmployeeCheckCount) \
+        .where(table.c.check_count > 0) \
+        .order_by(table.c.employee_id)
+    names = EmployeeCheckCount.format_columns
+    return [dict(zip(names, row)) for row in db.session.execute(stmt)]
+
+
+def total_checks(employee_id=None):
+    """Number of checks, summed from the summary table instead of COUNT(*)
+    over checks.
+    """
+    table = EmployeeCheckCount.__table__
+    stmt = select(func.coalesce(func.sum(table.c.check_count), 0))
+    if employee_id is not None:
+        stmt = stmt.where(table.c.employee_id == employee_id)
+    return db.session.execute(stmt).scalar()
+
+
+def _record_write(table, op, row_ids):
+    """Log a Core write to `table` for delta sync and ETag versions."""
+    if row_ids:
+        record_changes(db.session.connection(), table.name, op, row_ids)
+        touch(db.session, table.name)
+
+
+def supports_returning():
+    return db.engine.dialect.full_returning
+
+
+def insert_employees(names):
+    """Insert one employee per name and return their ids in input order.
+
+    On PostgreSQL this is a single `INSERT ... VALUES (...), (...)
+    RETURNING id` statement.  The caller commits.
+    """
+    table = Employee.__table__
+    rows = [{'name': name} for name in names]
+
+    if supports_returning():
+        stmt = table.insert().values(rows).returning(table.c.id)
+        # Ids come from the sequence in VALUES order, so sorting them
+        # restores input order whatever order RETURNING emits rows in.
+        ids = sorted(row.id for row in db.session.execute(stmt))
+    else:
+        ids = [db.session.execute(table.insert().values(row))
+               .inserted_primary_key[0] for row in rows]
+
+    _record_write(table, 'insert', ids)
+    return ids
+
+
+def _execute_for_row(stmt, table):
+    """Execute a single-row UPDATE/DELETE; return whether a row matched."""
+    if supports_returning():
+        stmt = stmt.returning(table.c.id)
+        return db.session.execute(stmt).first() is not None
+    return db.session.execute(stmt).rowcount > 0
+
+
+def rename_employee(employee_id, name):
+    """`UPDATE employees SET name = :name WHERE id = :id RETURNING id`.
+
+    Returns False when no such employee exists.  The caller commits.
+    """
+    table = Employee.__table__
+    stmt = table.update().where(table.c.id == employee_id).values(name=name)
+    found = _execute_for_row(stmt, table)
+    _record_write(table, 'update', [employee_id] if found else [])
+    return found
+
+
+def delete_employee_by_id(employee_id):
+    """`DELETE FROM employees WHERE id = :id RETURNING id`.
+
+    Unlike session.delete() this never loads Employee.checks.  Returns False
+    when no such employee exists.  The caller commits.
+    """
+    table = Employee.__table__
+    stmt = table.delete().where(table.c.id == employee_id)
+    found = _execute_for_row(stmt, table)
+    _record_write(table, 'delete', [employee_id] if found else [])
+    return found
+
+
+def update_employee_names(updates):
+    """Rename employees from a list of (id, name) pairs in one statement.
+
+    On PostgreSQL this runs `UPDATE employees SET name = v.name FROM
+    (VALUES ...) AS v (id, name) WHERE employees.id = v.id RETURNING id`.
+    Returns the set of ids that exist and were updated.  The caller commits.
+    """
+    table = Employee.__table__
+
+    if supports_returning():
+        new_names = values(column('id', Integer), column('name', String),
+                           name='new_names').data(updates)
+        stmt = table.update() \
+            .where(table.c.id == new_names.c.id) \
+            .values(name=new_names.c.name) \
+            .returning(table.c.id)
+        updated = {row.id for row in db.session.execute(stmt)}
+    else:
+        updated = set()
+        for employee_id, name in updates:
+            stmt = table.update() \
+                .where(table.c.id == employee_id) \
+                .values(name=name)
+            if db.session.execute(stmt).rowcount:
+                updated.add(employee_id)
+
+    _record_write(table, 'update', sorted(updated))
+    return updated
+
+
+def delete_employees(ids):
+    """Delete employees by id in one statement.
+
+    On PostgreSQL this runs `DELETE FROM employees WHERE id = ANY(:ids)
+    RETURNING id`, a single array parameter however many ids there are.
+    Returns the set of ids that existed and were deleted.  The caller
+    commits.
+    """
+    table = Employee.__table__
+
+    if db.engine.dialect.name == 'postgresql':
+        criterion = table.c.id == any_(
+            bindparam('ids', list(ids), type_=ARRAY(Integer)))
+    else:
+        criterion = table.c.id.in_(ids)
+    stmt = table.delete().where(criterion)
+
+    if supports_returning():
+        deleted = {row.id for row in
+                   db.session.execute(stmt.returning(table.c.id))}
+    else:
+        deleted = set(db.session.execute(
+            select(table.c.id).where(criterion)).scalars())
+        db.session.execute(stmt)
+
+    _record_write(table, 'delete', sorted(deleted))
+    return deleted
@@ -0,0 +1,83 @@
+import os
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_REQUEST_THRESHOLD = float(os.environ.get('SLOW_REQUEST_THRESHOLD', 1))
+
+
+class QueryStats:
+    """SQL statements run while handling one request."""
+
+    __slots__ = ('count', 'total_time', 'slowest_time', 'slowest_statement')
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total_time += duration
+        if duration >= self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+
+def current_query_stats():
+    return g.get('query_stats') if has_request_context() else None
+
+
+# Registered on the Engine class, so the primary and every replica engine
+# created by setup_db are covered.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context,
+                       executemany):
+    context.query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context,
+                  executemany):
+    stats = current_query_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - context.query_started)
+
+
+def init_query_stats(app):
+    """Count the queries of each request; report them in X-Query-Count and
+    X-Query-Time (ms) headers when the app is in debug mode or the
+    QUERY_STATS_HEADERS config is set, and log requests slower than
+    SLOW_REQUEST_THRESHOLD seconds (overridable in app.config).
+
+    Queries run while a streamed response is being sent are not counted.
+    """
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+
+        if app.debug or app.config.get('QUERY_STATS_HEADERS'):
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time'] = \
+                f'{stats.total_time * 1000:.3f}'
+
+        elapsed = time.perf_counter() - g.request_started
+        threshold = app.config.get('SLOW_REQUEST_THRESHOLD',
+                                   SLOW_REQUEST_THRESHOLD)
+        if elapsed >= threshold:
+            app.logger.warning(
+                'Slow request: %s %s %d in %.3fs, %d queries in %.3fs, '
+                'slowest %.3fs: %s', request.method, request.full_path,
+                response.status_code, elapsed, stats.count,
+                stats.total_time, stats.slowest_time,
+                stats.slowest_statement)
+        return response
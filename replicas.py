@@ -0,0 +1,156 @@
+import os
+import random
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import orm, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+from db_pool import engine_options
+from versions import table_versions
+
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in
+    os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+]
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = \
+    float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 1))
+# libpq takes whole seconds, at least 2.
+REPLICA_CONNECT_TIMEOUT = int(os.environ.get('REPLICA_CONNECT_TIMEOUT', 2))
+
+# Zero while the replica has replayed everything it has received, so an
+# idle primary does not make the replica look stale.
+REPLICA_LAG_SQL = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM '
+    'now() - pg_last_xact_replay_timestamp()) END')
+
+
+def replica_engine_options(url):
+    """engine_options() for a replica.  Connecting gives up after
+    REPLICA_CONNECT_TIMEOUT seconds, so a replica that stops answering
+    cannot hold a request for the operating system's TCP timeout.
+    """
+    options = engine_options(url)
+    if make_url(url).get_backend_name() == 'postgresql':
+        options['connect_args'] = {
+            'connect_timeout': REPLICA_CONNECT_TIMEOUT}
+    return options
+
+
+class Replica:
+    """A read replica's engine and its replication lag, re-measured at
+    most every `check_interval` seconds in a background thread, so no
+    request ever waits on the replica to answer.
+    """
+
+    def __init__(self, engine, check_interval=REPLICA_LAG_CHECK_INTERVAL):
+        self.engine = engine
+        self.check_interval = check_interval
+        self._lag = None
+        self._checked_at = None
+        self._measuring = False
+        self._lock = threading.Lock()
+
+    def measure_lag(self):
+        """Seconds behind the primary, or None if the replica is down."""
+        if self.engine.dialect.name != 'postgresql':
+            return 0.0
+        try:
+            with self.engine.connect() as connection:
+                return float(connection.execute(REPLICA_LAG_SQL).scalar())
+        except Exception:
+            return None
+
+    def refresh(self):
+        """Measure the lag now and keep the result."""
+        lag = None
+        try:
+            lag = self.measure_lag()
+        finally:
+            with self._lock:
+                self._lag = lag
+                self._checked_at = time.monotonic()
+                self._measuring = False
+        return lag
+
+    def lag(self):
+        """The last measured lag.  None, meaning "use the primary", until
+        the first measurement and while an overdue one is in flight.
+        """
+        with self._lock:
+            if self._checked_at is not None and \
+                    time.monotonic() - self._checked_at < self.check_interval:
+                return self._lag
+            if not self._measuring:
+                self._measuring = True
+                threading.Thread(target=self.refresh, daemon=True).start()
+            return None
+
+
+class ReplicaSet:
+    """Picks a replica for a read of some tables, or None for the primary.
+
+    A replica qualifies while it is at most `max_lag` seconds behind.
+    Reads of a table written in the last `max_lag` seconds go to the
+    primary, so whoever made the write reads it back, even through
+    another worker, as the write time is kept with the table versions.
+    """
+
+    def __init__(self, engines, max_lag=REPLICA_MAX_LAG):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+
+    def choose(self, tables):
+        if not self.replicas or \
+                table_versions.written_within(tables, self.max_lag):
+            return None
+        fresh = []
+        for replica in self.replicas:
+            lag = replica.lag()
+            if lag is not None and lag <= self.max_lag:
+                fresh.append(replica)
+        return random.choice(fresh).engine if fresh else None
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends reads to the replica chosen for the request.
+
+    Flushes and INSERT/UPDATE/DELETE statements always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = g.get('replica_engine') if has_app_context() else None
+        if replica is not None and not self._flushing and \
+                not isinstance(clause, UpdateBase):
+            return replica
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def use_replica(tables):
+    """Let a read-only view read from a replica.
+
+    `tables` is the tuple of tables the view reads, or a callable taking
+    the request args and returning it.  Goes beneath @requires_auth.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            replicas = current_app.extensions.get('replicas')
+            if replicas is not None:
+                table_names = tables(request.args) if callable(tables) \
+                    else tables
+                g.replica_engine = replicas.choose(table_names)
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
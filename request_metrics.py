@@ -0,0 +1,108 @@
+import threading
+import time
+from flask import g, has_request_context, request
+from flask.json import JSONEncoder
+from metrics import Histogram
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                   10)
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """Request latency histograms per route, method, status and phase."""
+
+    def __init__(self, buckets=REQUEST_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, phase, seconds):
+        key = (route, method, status, phase)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    key, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def exposition(self, name='http_request_duration_seconds'):
+        """The histograms in the Prometheus text exposition format."""
+        lines = [
+            f'# HELP {name} Time spent handling requests, by phase.',
+            f'# TYPE {name} histogram'
+        ]
+        for key in sorted(self._histograms):
+            histogram = self._histograms[key]
+            labels = ','.join(
+                f'{label}="{_label_value(value)}"' for label, value in
+                zip(('route', 'method', 'status', 'phase'), key))
+            buckets = histogram.cumulative()
+            for bound, total in buckets:
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {buckets[-1][1]}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+class TimedJSONEncoder(JSONEncoder):
+    """Adds the time spent encoding JSON to the request's g.json_time.
+
+    Mixed in ahead of the app's encoder by init_request_metrics.
+    """
+
+    def encode(self, o):
+        started = time.perf_counter()
+        try:
+            return super().encode(o)
+        finally:
+            if has_request_context():
+                g.json_time = g.get('json_time', 0.0) + \
+                    time.perf_counter() - started
+
+
+def init_request_metrics(app, metrics=request_metrics):
+    """Time every request into `metrics`: the total, plus its auth (token
+    parsing and verification), db (SQL statements, from query_stats) and
+    serialization (JSON encoding) phases.
+
+    Streamed bodies are sent after the request is timed, so only the time
+    to start the stream is counted.  Call it after init_json_provider, so
+    the timing wraps the configured encoder.
+    """
+    if not issubclass(app.json_encoder, TimedJSONEncoder):
+        app.json_encoder = type('TimedJSONEncoder',
+                                (TimedJSONEncoder, app.json_encoder), {})
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = response.status_code
+        query_stats = g.get('query_stats')
+        phases = (
+            ('total', time.perf_counter() - started),
+            ('auth', g.get('auth_time')),
+            ('db', query_stats.total_time if query_stats else None),
+            ('serialization', g.get('json_time'))
+        )
+        for phase, seconds in phases:
+            if seconds is not None:
+                metrics.observe(route, request.method, status, phase,
+                                seconds)
+        return response
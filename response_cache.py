@@ -0,0 +1,191 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, g, request
+from versions import list_etag, not_modified, table_versions
+
+RESPONSE_CACHE_MAX_BYTES = int(
+    os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class CachedResponse:
+    __slots__ = ('body', 'mimetype', 'etag', 'tables', 'versions',
+                 'encodings')
+
+    def __init__(self, body, mimetype, etag, tables, versions):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.tables = tables
+        self.versions = versions
+        # content encoding -> compressed body, filled in by compression
+        self.encodings = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(map(len, self.encodings.values()))
+
+    def to_response(self):
+        response = Response(self.body, mimetype=self.mimetype)
+        response.set_etag(self.etag)
+        return response
+
+
+class ResponseCache:
+    """LRU cache of serialized GET response bodies, bounded in bytes.
+
+    Each entry remembers the versions of the tables it was built from.  A
+    lookup only hits while those versions are unchanged, and committed
+    writes also evict the entries built from the tables they touched, so
+    a write to employees never costs the checks entries their place.
+    Compressed copies of a body count towards its entry's size.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.versions != versions:
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        if len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.size += entry.size
+            self._evict()
+
+    def add_encoding(self, key, entry, encoding, data):
+        """Keep `data`, the body of the entry at `key` compressed with
+        `encoding`, alongside it.  Does nothing if the entry has left the
+        cache meanwhile.
+        """
+        with self._lock:
+            if self._entries.get(key) is not entry or \
+                    encoding in entry.encodings:
+                return
+            entry.encodings[encoding] = data
+            self.size += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, tables):
+        """Drop every entry built from any of `tables`."""
+        tables = set(tables)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if tables.intersection(entry.tables)]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def _remove(self, key):
+        self.size -= self._entries.pop(key).size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'size': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = self.misses = 0
+            self.evictions = self.invalidations = 0
+
+
+response_cache = ResponseCache()
+table_versions.subscribe(response_cache.invalidate)
+
+
+def permission_fingerprint(payload):
+    permissions = sorted(payload.get('permissions', []))
+    return hashlib.sha1(' '.join(permissions).encode()).hexdigest()
+
+
+def cached_list(tables):
+    """Serve a GET list view from response_cache, with ETag revalidation.
+
+    `tables` is the tuple of tables the response is built from, or a
+    callable taking the request args and returning it.  Goes beneath
+    @requires_auth; only 200 responses are cached.  The served entry is
+    left in g.cached_response as (key, entry) for compression.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(payload, *args, **kwargs):
+            table_names = tables(request.args) if callable(tables) \
+                else tables
+            # Read the versions before the view queries anything, so a
+            # write committed meanwhile leaves the entry already stale.
+            versions = table_versions.snapshot(table_names)
+            # What a caller may see depends on its permissions, so neither
+            # an entry nor an ETag is shared across permission sets.
+            fingerprint = permission_fingerprint(payload)
+            etag = list_etag(request, *table_names, versions=versions,
+                             scope=fingerprint)
+            if request.if_none_match.contains_weak(etag):
+                return not_modified(etag)
+
+            if response_cache.max_bytes <= 0:
+                response = f(payload, *args, **kwargs)
+                response.set_etag(etag)
+                return response
+
+            key = (request.path, request.query_string, fingerprint)
+            entry = response_cache.get(key, versions)
+            if entry is not None:
+                g.cached_response = (key, entry)
+                response = entry.to_response()
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = f(payload, *args, **kwargs)
+            response.set_etag(etag)
+            if response.status_code == 200 and not response.is_streamed:
+                entry = CachedResponse(response.get_data(),
+                                       response.mimetype, etag, table_names,
+                                       versions)
+                response_cache.put(key, entry)
+                g.cached_response = (key, entry)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    return decorator
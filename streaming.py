@@ -0,0 +1,47 @@
+import os
+from json_provider import json_provider
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+EXPORT_MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def _dumps(item):
+    return json_provider.dumps(item)
+
+
+def _batched(lines, batch_size):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def ndjson_chunks(items, batch_size=EXPORT_BATCH_SIZE):
+    return _batched((_dumps(item) + '\n' for item in items), batch_size)
+
+
+def json_array_chunks(key, items, batch_size=EXPORT_BATCH_SIZE):
+    """Yield `{"success": true, "<key>": [...]}` a batch of items at a time."""
+    def lines():
+        yield '{"success":true,"%s":[' % key
+        separator = ''
+        for item in items:
+            yield separator + _dumps(item)
+            separator = ','
+        yield ']}'
+
+    return _batched(lines(), batch_size)
+
+
+def export_chunks(export_format, key, items, batch_size=EXPORT_BATCH_SIZE):
+    if export_format == 'ndjson':
+        return ndjson_chunks(items, batch_size)
+    return json_array_chunks(key, items, batch_size)
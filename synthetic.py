@@ -0,0 +1,69 @@
+import random
+from sqlalchemy import func, select
+from models import db, Check, Employee
+from versions import touch
+
+GENERATE_BATCH_SIZE = 10000
+
+
+def _batches(total, batch_size):
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
+
+
+def _commit_batch(*tables):
+    touch(db.session, *tables)
+    db.session.commit()
+
+
+def generate_employees(count, batch_size=GENERATE_BATCH_SIZE):
+    """Insert `count` employees in multi-row batches; return their ids."""
+    table = Employee.__table__
+    last_id = db.session.execute(
+        select(func.coalesce(func.max(table.c.id), 0))).scalar()
+
+    for start, size in _batches(count, batch_size):
+        db.session.execute(table.insert(), [
+            {'name': f'Synthetic Employee {start + i + 1}'}
+            for i in range(size)
+        ])
+        _commit_batch(table.name)
+
+    return list(db.session.execute(
+        select(table.c.id).where(table.c.id > last_id)
+        .order_by(table.c.id)).scalars())
+
+
+def generate_checks(employee_ids, count, batch_size=GENERATE_BATCH_SIZE,
+                    seed=0):
+    """Insert `count` checks spread at random over `employee_ids`."""
+    table = Check.__table__
+    rng = random.Random(seed)
+
+    for _, size in _batches(count, batch_size):
+        db.session.execute(table.insert(), [
+            {'employee_id': rng.choice(employee_ids)} for _ in range(size)
+        ])
+        _commit_batch(table.name)
+
+
+def generate_data(employees, checks, batch_size=GENERATE_BATCH_SIZE, seed=0):
+    """Add `employees` employees and `checks` checks for load testing.
+
+    Rows go in through Core executemany batches, skipping the ORM events,
+    so they are not in the change log; the per-employee check counts are
+    kept by the checks triggers.  With no new employees, checks are spread
+    over the existing ones.  The same `seed` gives the same data.
+    Returns (employees added, checks added).
+    """
+    new_ids = generate_employees(employees, batch_size)
+    if checks:
+        employee_ids = new_ids
+        if not employee_ids:
+            employee_ids = list(db.session.execute(
+                select(Employee.__table__.c.id)).scalars())
+        if not employee_ids:
+            raise ValueError('Checks need at least one employee')
+        generate_checks(employee_ids, checks, batch_size, seed)
+
+    return len(new_ids), checks
@@ -16,6 +16,36 @@ SET xmloption = content;
 SET client_min_messages = warning;
 SET row_security = off;
 
+--
+-- Name: count_checks(); Type: FUNCTION; Schema: public; Owner: postgres
+--
+
+CREATE FUNCTION public.count_checks() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE employee_check_counts AS counts
+                SET check_count = counts.check_count - removed.check_count
+                FROM (SELECT employee_id, COUNT(*) AS check_count
+                      FROM old_checks GROUP BY employee_id) AS removed
+                WHERE counts.employee_id = removed.employee_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO employee_check_counts (employee_id, check_count)
+                SELECT employee_id, COUNT(*) FROM new_checks
+                GROUP BY employee_id
+                ON CONFLICT (employee_id) DO UPDATE
+                SET check_count = employee_check_counts.check_count
+                    + EXCLUDED.check_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+
+
+ALTER FUNCTION public.count_checks() OWNER TO postgres;
+
 SET default_tablespace = '';
 
 SET default_table_access_method = heap;
@@ -32,6 +62,42 @@ CREATE TABLE public.checks (
 
 ALTER TABLE public.checks OWNER TO postgres;
 
+--
+-- Name: changes; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.changes (
+    seq bigint NOT NULL,
+    table_name character varying NOT NULL,
+    row_id integer NOT NULL,
+    op character varying NOT NULL,
+    changed_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+
+ALTER TABLE public.changes OWNER TO postgres;
+
+--
+-- Name: changes_seq_seq; Type: SEQUENCE; Schema: public; Owner: postgres
+--
+
+CREATE SEQUENCE public.changes_seq_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+
+ALTER TABLE public.changes_seq_seq OWNER TO postgres;
+
+--
+-- Name: changes_seq_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+--
+
+ALTER SEQUENCE public.changes_seq_seq OWNED BY public.changes.seq;
+
+
 --
 -- Name: checks_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
 --
@@ -54,6 +120,18 @@ ALTER TABLE public.checks_id_seq OWNER TO postgres;
 ALTER SEQUENCE public.checks_id_seq OWNED BY public.checks.id;
 
 
+--
+-- Name: employee_check_counts; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.employee_check_counts (
+    employee_id integer NOT NULL,
+    check_count integer NOT NULL
+);
+
+
+ALTER TABLE public.employee_check_counts OWNER TO postgres;
+
 --
 -- Name: employees; Type: TABLE; Schema: public; Owner: postgres
 --
@@ -88,6 +166,13 @@ ALTER TABLE public.employees_id_seq OWNER TO postgres;
 ALTER SEQUENCE public.employees_id_seq OWNED BY public.employees.id;
 
 
+--
+-- Name: changes seq; Type: DEFAULT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.changes ALTER COLUMN seq SET DEFAULT nextval('public.changes_seq_seq'::regclass);
+
+
 --
 -- Name: checks id; Type: DEFAULT; Schema: public; Owner: postgres
 --
@@ -115,6 +200,16 @@ COPY public.checks (id, employee_id) FROM stdin;
 \.
 
 
+--
+-- Data for Name: employee_check_counts; Type: TABLE DATA; Schema: public; Owner: postgres
+--
+
+COPY public.employee_check_counts (employee_id, check_count) FROM stdin;
+1	3
+2	2
+\.
+
+
 --
 -- Data for Name: employees; Type: TABLE DATA; Schema: public; Owner: postgres
 --
@@ -141,6 +236,14 @@ SELECT pg_catalog.setval('public.checks_id_seq', 5, true);
 SELECT pg_catalog.setval('public.employees_id_seq', 4, true);
 
 
+--
+-- Name: changes changes_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.changes
+    ADD CONSTRAINT changes_pkey PRIMARY KEY (seq);
+
+
 --
 -- Name: checks checks_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -149,6 +252,14 @@ ALTER TABLE ONLY public.checks
     ADD CONSTRAINT checks_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: employee_check_counts employee_check_counts_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.employee_check_counts
+    ADD CONSTRAINT employee_check_counts_pkey PRIMARY KEY (employee_id);
+
+
 --
 -- Name: employees employees_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -157,6 +268,34 @@ ALTER TABLE ONLY public.employees
     ADD CONSTRAINT employees_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: ix_checks_employee_id; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX ix_checks_employee_id ON public.checks USING btree (employee_id, id);
+
+
+--
+-- Name: checks checks_count_delete; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER checks_count_delete AFTER DELETE ON public.checks REFERENCING OLD TABLE AS old_checks FOR EACH STATEMENT EXECUTE FUNCTION public.count_checks();
+
+
+--
+-- Name: checks checks_count_insert; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER checks_count_insert AFTER INSERT ON public.checks REFERENCING NEW TABLE AS new_checks FOR EACH STATEMENT EXECUTE FUNCTION public.count_checks();
+
+
+--
+-- Name: checks checks_count_update; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER checks_count_update AFTER UPDATE ON public.checks REFERENCING OLD TABLE AS old_checks NEW TABLE AS new_checks FOR EACH STATEMENT EXECUTE FUNCTION public.count_checks();
+
+
 --
 -- Name: checks checks_employee_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -165,6 +304,14 @@ ALTER TABLE ONLY public.checks
     ADD CONSTRAINT checks_employee_id_fkey FOREIGN KEY (employee_id) REFERENCES public.employees(id);
 
 
+--
+-- Name: employee_check_counts employee_check_counts_employee_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.employee_check_counts
+    ADD CONSTRAINT employee_check_counts_employee_id_fkey FOREIGN KEY (employee_id) REFERENCES public.employees(id) ON DELETE CASCADE;
+
+
 --
 -- PostgreSQL database dump complete
 --
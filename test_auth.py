@@ -0,0 +1,327 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from flask import Flask, jsonify
+from jose import jwt
+import auth
+from auth import (AuthError, JWKSKeyStore, TokenCache,
+                  check_permissions_cached, requires_auth)
+from auth_stand_in import JWKSServer, TokenIssuer
+import jwt_backends
+from jwt_backends import available_backends
+
+
+def make_jwk(kid):
+    return {
+        'kty': 'RSA',
+        'kid': kid,
+        'use': 'sig',
+        'n': 'n-' + kid,
+        'e': 'AQAB'
+    }
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.jwks = JWKSServer([make_jwk('key-1')])
+
+    def tearDown(self) -> None:
+        self.jwks.stop()
+
+    def test_keys_are_fetched_once_within_ttl(self):
+        store = JWKSKeyStore(self.jwks.url, ttl=60)
+
+        for _ in range(50):
+            self.assertEqual(store.get_key('key-1')['kid'], 'key-1')
+
+        self.assertEqual(self.jwks.hits, 1)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        store = JWKSKeyStore(self.jwks.url, ttl=60, min_refetch_interval=60)
+        store.get_key('key-1')
+
+        for _ in range(20):
+            self.assertIsNone(store.get_key('bogus'))
+
+        self.assertEqual(self.jwks.hits, 1)
+
+    def test_unknown_kid_triggers_refetch_after_rotation(self):
+        store = JWKSKeyStore(self.jwks.url, ttl=60, min_refetch_interval=0)
+        store.get_key('key-1')
+
+        self.jwks.keys.append(make_jwk('key-2'))
+
+        self.assertEqual(store.get_key('key-2')['kid'], 'key-2')
+        self.assertEqual(self.jwks.hits, 2)
+
+    def test_stale_keys_served_while_refreshing(self):
+        store = JWKSKeyStore(self.jwks.url, ttl=0.05)
+        store.get_key('key-1')
+        time.sleep(0.1)
+
+        self.jwks.keys = [make_jwk('key-1'), make_jwk('key-2')]
+
+        self.assertEqual(store.get_key('key-1')['kid'], 'key-1')
+        for _ in range(100):
+            if store.fetch_count == 2:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(store.fetch_count, 2)
+        self.assertEqual(store.get_key('key-2')['kid'], 'key-2')
+
+
+class SlowSession:
+    """Stands in for requests.Session: counts GETs, which take `delay`
+    seconds and then fail, or return `keys`.
+    """
+
+    def __init__(self, keys=None, delay=0.1):
+        self.keys = keys
+        self.delay = delay
+        self.calls = 0
+
+    def get(self, url, timeout):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.keys is None:
+            raise ConnectionError('issuer unavailable')
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'keys': self.keys}
+
+
+class JWKSFirstFetchTestCase(unittest.TestCase):
+    def get_key_concurrently(self, store, threads=10):
+        results = []
+
+        def get_key():
+            try:
+                results.append(store.get_key('key-1'))
+            except Exception as e:
+                results.append(e)
+
+        workers = [threading.Thread(target=get_key) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_concurrent_first_requests_share_one_fetch(self):
+        session = SlowSession([make_jwk('key-1')])
+        store = JWKSKeyStore('https://issuer.test/jwks', session=session)
+
+        results = self.get_key_concurrently(store)
+
+        self.assertEqual(session.calls, 1)
+        self.assertEqual([key['kid'] for key in results], ['key-1'] * 10)
+
+    def test_failed_first_fetch_is_rate_limited(self):
+        session = SlowSession()
+        store = JWKSKeyStore('https://issuer.test/jwks', session=session,
+                             min_refetch_interval=60)
+
+        results = self.get_key_concurrently(store)
+        with self.assertRaises(Exception):
+            store.get_key('key-1')
+
+        self.assertEqual(session.calls, 1)
+        self.assertTrue(all(isinstance(result, Exception)
+                            for result in results))
+
+        store.min_refetch_interval = 0
+        session.keys = [make_jwk('key-1')]
+        self.assertEqual(store.get_key('key-1')['kid'], 'key-1')
+        self.assertEqual(session.calls, 2)
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = TokenCache(maxsize=2)
+        self.payload = {
+            'exp': time.time() + 60,
+            'permissions': ['read:checks']
+        }
+
+    def test_repeat_token_is_a_hit(self):
+        self.assertIsNone(self.cache.get('token-a'))
+        self.cache.put('token-a', self.payload)
+
+        entry = self.cache.get('token-a')
+
+        self.assertIs(entry.payload, self.payload)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        self.assertEqual(self.cache.stats()['hit_ratio'], 0.5)
+
+    def test_expired_token_is_evicted(self):
+        self.cache.put('token-a', {'exp': time.time() - 1})
+
+        self.assertIsNone(self.cache.get('token-a'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_token_without_exp_is_not_cached(self):
+        self.cache.put('token-a', {'permissions': []})
+
+        self.assertIsNone(self.cache.get('token-a'))
+
+    def test_least_recently_used_token_is_evicted(self):
+        self.cache.put('token-a', self.payload)
+        self.cache.put('token-b', self.payload)
+        self.cache.get('token-a')
+        self.cache.put('token-c', self.payload)
+
+        self.assertIsNotNone(self.cache.get('token-a'))
+        self.assertIsNone(self.cache.get('token-b'))
+        self.assertEqual(self.cache.stats()['size'], 2)
+
+    def test_permission_result_is_memoized(self):
+        entry = self.cache.put('token-a', self.payload)
+
+        self.assertTrue(check_permissions_cached('read:checks', entry))
+        with self.assertRaises(AuthError) as ctx:
+            check_permissions_cached('delete:employees', entry)
+
+        self.assertEqual(ctx.exception.status_code, 403)
+        self.assertEqual(entry.permissions['read:checks'], None)
+        self.assertIn('delete:employees', entry.permissions)
+
+    def test_denied_permission_raises_a_fresh_error(self):
+        entry = self.cache.put('token-a', self.payload)
+        errors = []
+        for _ in range(3):
+            try:
+                check_permissions_cached('delete:employees', entry)
+            except AuthError as ae:
+                errors.append(ae)
+
+        self.assertEqual(len({id(error) for error in errors}), 3)
+        self.assertEqual(errors[0].error, errors[2].error)
+        self.assertEqual(errors[2].status_code, 403)
+
+
+class JWTBackendTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.issuer = TokenIssuer(bits=1024, issuer='https://issuer.test/',
+                                 audience='restaurant')
+
+    def mint(self, **claims):
+        return self.issuer.mint(['read:checks'], expires_in=60, **claims)
+
+    def decode(self, backend, token):
+        return backend.decode(token,
+                              backend.load_key(self.issuer.public_jwk),
+                              algorithms=['RS256'], audience='restaurant',
+                              issuer='https://issuer.test/')
+
+    def test_backends_decode_valid_token(self):
+        token = self.mint()
+
+        for backend in available_backends():
+            payload = self.decode(backend, token)
+            self.assertEqual(payload['permissions'], ['read:checks'])
+
+    def test_backends_reject_expired_token(self):
+        token = self.mint(exp=int(time.time()) - 60)
+
+        for backend in available_backends():
+            with self.assertRaises(jwt.ExpiredSignatureError):
+                self.decode(backend, token)
+
+    def test_backends_reject_wrong_audience(self):
+        token = self.mint(aud='someone-else')
+
+        for backend in available_backends():
+            with self.assertRaises(jwt.JWTClaimsError):
+                self.decode(backend, token)
+
+    def test_backends_reject_tampered_token(self):
+        header, payload, signature = self.mint().split('.')
+        forged = jwt.encode({'permissions': ['delete:employees']}, 'secret')
+        token = '.'.join([header, forged.split('.')[1], signature])
+
+        for backend in available_backends():
+            with self.assertRaises(jwt.JWTError):
+                self.decode(backend, token)
+
+    def test_missing_package_fails_when_the_store_is_built(self):
+        with mock.patch.object(jwt_backends, 'rsa', None), \
+                mock.patch.object(auth, 'JWT_BACKEND', 'cryptography'):
+            with self.assertRaises(ImportError):
+                JWKSKeyStore('https://issuer.test/jwks.json')
+
+
+class StandInIssuerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.issuer = TokenIssuer(bits=1024)
+
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+
+        @self.app.route('/employees', methods=['DELETE'])
+        @requires_auth('delete:employees')
+        def delete_employees(payload):
+            return jsonify({'sub': payload['sub']})
+
+        self.client = self.app.test_client
+        self.saved_source = (auth.jwks_store.url, auth.jwks_store.keys)
+        self.issuer.install()
+        auth.token_cache.clear()
+
+    def tearDown(self) -> None:
+        url, keys = self.saved_source
+        auth.jwks_store.configure(url=url, keys=keys)
+        auth.token_cache.clear()
+
+    def delete(self, token):
+        return self.client().delete(
+            '/employees', headers={'Authorization': 'Bearer ' + token})
+
+    def test_role_tokens_carry_their_permissions(self):
+        res = self.delete(self.issuer.mint_role('manager'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['sub'], 'stand-in|manager')
+        self.assertEqual(self.delete(self.issuer.mint_role('server'))
+                         .status_code, 403)
+
+    def test_token_from_another_key_is_rejected(self):
+        other = TokenIssuer(bits=1024)
+
+        res = self.delete(other.mint_role('manager'))
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_keys_load_from_a_local_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jwks.json')
+            with open(path, 'w') as jwks_file:
+                json.dump(self.issuer.jwks, jwks_file)
+
+            for url in (path, 'file://' + path):
+                store = JWKSKeyStore(url)
+                self.assertEqual(store.get_key(self.issuer.kid),
+                                 self.issuer.public_jwk)
+
+    def test_saved_key_keeps_its_kid(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stand-in.pem')
+            created = TokenIssuer.from_file(path, bits=1024)
+            loaded = TokenIssuer.from_file(path)
+
+        self.assertEqual(created.public_jwk, loaded.public_jwk)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+from datetime import datetime, timedelta
+from flask import Flask
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from models import setup_db, db, Change, prune_changes  # noqa: E402
+from queries import change_log_floor, changes_since  # noqa: E402
+
+
+class PruneChangesTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        setup_db(self.app, 'sqlite://', [])
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        # Deletes, so changes_since needs no rows to attach data to.
+        db.session.execute(Change.__table__.insert(), [
+            {'table_name': 'checks', 'row_id': i, 'op': 'delete'}
+            for i in range(1, 6)])
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def prune(self, **kwargs):
+        floor = prune_changes(db.session.connection(), **kwargs)
+        db.session.commit()
+        return floor
+
+    def seqs(self, since=0):
+        changes, _, _ = changes_since(since, 100, ['checks'])
+        return [change['seq'] for change in changes]
+
+    def test_floor_is_zero_until_pruned(self):
+        self.assertEqual(change_log_floor(), 0)
+        self.assertIsNone(self.prune(retention_days=0, max_rows=0))
+
+    def test_max_rows_keeps_the_newest_entries(self):
+        self.assertEqual(self.prune(retention_days=0, max_rows=2), 3)
+
+        self.assertEqual(change_log_floor(), 3)
+        self.assertEqual(self.seqs(), [4, 5])
+        self.assertEqual(self.seqs(since=3), [4, 5])
+
+    def test_retention_drops_old_entries(self):
+        table = Change.__table__
+        db.session.execute(
+            table.update().where(table.c.seq <= 2)
+            .values(changed_at=datetime.utcnow() - timedelta(days=31)))
+        db.session.commit()
+
+        self.assertEqual(self.prune(retention_days=30, max_rows=0), 2)
+        self.assertEqual(self.seqs(), [3, 4, 5])
+        # Nothing newer has aged out, so the floor stays put.
+        self.assertIsNone(self.prune(retention_days=30, max_rows=0))
+        self.assertEqual(change_log_floor(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import os
+from flask import Flask
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from models import setup_db, db, Check, Employee  # noqa: E402
+from queries import check_counts  # noqa: E402
+
+
+class CheckCountTriggerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        setup_db(self.app, 'sqlite://', [])
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        db.session.add_all([Employee(id=1, name='First'),
+                            Employee(id=2, name='Second')])
+        db.session.commit()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def counts(self):
+        return {row['employee_id']: row['check_count']
+                for row in check_counts()}
+
+    def test_core_inserts_are_counted(self):
+        db.session.execute(Check.__table__.insert(), [
+            {'employee_id': 1}, {'employee_id': 1}, {'employee_id': 2}])
+        db.session.commit()
+
+        self.assertEqual(self.counts(), {1: 2, 2: 1})
+
+    def test_moved_and_deleted_checks_are_counted(self):
+        db.session.add_all([Check(id=1, employee_id=1),
+                            Check(id=2, employee_id=1)])
+        db.session.commit()
+
+        Check.query.get(1).employee_id = 2
+        db.session.commit()
+        self.assertEqual(self.counts(), {1: 1, 2: 1})
+
+        db.session.execute(Check.__table__.delete()
+                           .where(Check.__table__.c.employee_id == 1))
+        db.session.commit()
+        self.assertEqual(self.counts(), {2: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
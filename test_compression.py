@@ -0,0 +1,113 @@
+import unittest
+import gzip
+import json
+import zlib
+from flask import Flask, Response, jsonify, stream_with_context
+from compression import GzipCodec, available_codecs, init_compression
+from response_cache import cached_list, response_cache
+
+ROWS = [{'id': i, 'name': f'Employee {i}'} for i in range(200)]
+
+
+def make_app(codecs):
+    app = Flask(__name__)
+    init_compression(app, codecs, min_size=256)
+
+    @app.route('/large')
+    def large():
+        return jsonify({'employees': ROWS})
+
+    @app.route('/small')
+    def small():
+        return jsonify({'success': True})
+
+    @app.route('/export')
+    def export():
+        def chunks():
+            for row in ROWS:
+                yield json.dumps(row) + '\n'
+
+        return Response(stream_with_context(chunks()),
+                        mimetype='application/x-ndjson')
+
+    cached = cached_list(('compression_test',))(
+        lambda payload: jsonify({'employees': ROWS}))
+
+    @app.route('/cached')
+    def cached_view():
+        return cached({'permissions': []})
+
+    return app
+
+
+class CompressionTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = make_app([GzipCodec()]).test_client
+        response_cache.clear()
+
+    def get(self, path, encoding='gzip', headers=None, **kwargs):
+        headers = dict(headers or {})
+        headers['Accept-Encoding'] = encoding
+        return self.client().get(path, headers=headers, **kwargs)
+
+    def test_large_response_is_compressed(self):
+        res = self.get('/large')
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(res.data)),
+                         {'employees': ROWS})
+        self.assertEqual(int(res.headers['Content-Length']), len(res.data))
+
+    def test_small_or_unaccepted_responses_are_not(self):
+        for path, encoding in (('/small', 'gzip'), ('/large', 'identity'),
+                               ('/large', 'gzip;q=0')):
+            res = self.get(path, encoding)
+
+            self.assertNotIn('Content-Encoding', res.headers)
+            self.assertIn('Accept-Encoding', res.headers['Vary'])
+
+    def test_stream_is_compressed_chunk_by_chunk(self):
+        res = self.get('/export', buffered=False)
+        chunks = iter(res.response)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        first = decompressor.decompress(next(chunks))
+        rest = b''.join(decompressor.decompress(chunk) for chunk in chunks)
+        res.close()
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(first), ROWS[0])
+        self.assertEqual(len((first + rest).splitlines()), len(ROWS))
+
+    def test_cached_response_keeps_its_compressed_body(self):
+        first = self.get('/cached')
+        second = self.get('/cached')
+
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertTrue(second.headers['ETag'].startswith('W/'))
+        self.assertEqual(len(response_cache._entries), 1)
+        entry = next(iter(response_cache._entries.values()))
+        self.assertEqual(entry.encodings['gzip'], second.data)
+
+        res = self.get('/cached', headers={
+            'If-None-Match': second.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+
+    def test_client_preference_then_server_order(self):
+        codecs = available_codecs(['zstd', 'br', 'gzip'])
+        names = [codec.name for codec in codecs]
+        client = make_app(codecs).test_client
+
+        res = client().get('/large', headers={
+            'Accept-Encoding': 'gzip, br;q=0.5, zstd;q=0.5'})
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+
+        res = client().get('/large', headers={
+            'Accept-Encoding': 'gzip, br, zstd'})
+        self.assertEqual(res.headers['Content-Encoding'], names[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
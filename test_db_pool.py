@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+from sqlalchemy import create_engine, exc
+from db_pool import InstrumentedNullPool, InstrumentedQueuePool, \
+    engine_options, pool_stats
+
+
+class InstrumentedPoolTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.engine = create_engine(
+            'sqlite:///' + self.path,
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=1,
+            pool_timeout=0.1,
+            connect_args={'check_same_thread': False}
+        )
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_checked_out_and_overflow(self):
+        first = self.engine.connect()
+        second = self.engine.connect()
+        stats = pool_stats(self.engine)
+
+        self.assertEqual(stats['checked_out'], 2)
+        self.assertEqual(stats['overflow'], 1)
+        self.assertEqual(stats['wait_time']['count'], 2)
+
+        first.close()
+        second.close()
+        self.assertEqual(pool_stats(self.engine)['checked_out'], 0)
+
+    def test_checkout_timeout_is_counted(self):
+        connections = [self.engine.connect(), self.engine.connect()]
+
+        with self.assertRaises(exc.TimeoutError):
+            self.engine.connect()
+
+        stats = pool_stats(self.engine)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['wait_time']['buckets']['0.05'], 2)
+        self.assertEqual(stats['wait_time']['buckets']['0.5'], 3)
+
+        for connection in connections:
+            connection.close()
+
+    def test_invalidation_is_counted(self):
+        connection = self.engine.connect()
+        connection.invalidate()
+        connection.close()
+
+        self.assertEqual(pool_stats(self.engine)['invalidations'], 1)
+
+
+class EngineOptionsTestCase(unittest.TestCase):
+    def test_sqlite_keeps_default_pool(self):
+        self.assertEqual(engine_options('sqlite:///capstone.db'), {})
+
+    def test_postgresql_uses_queue_pool(self):
+        options = engine_options('postgresql://localhost/capstone')
+
+        self.assertIs(options['poolclass'], InstrumentedQueuePool)
+        self.assertIn('pool_size', options)
+        self.assertTrue(options['pool_pre_ping'])
+
+    def test_pgbouncer_mode_leaves_pooling_to_pgbouncer(self):
+        options = engine_options('postgresql://localhost/capstone',
+                                 pgbouncer=True)
+
+        self.assertIs(options['poolclass'], InstrumentedNullPool)
+        self.assertNotIn('pool_size', options)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import tempfile
+from flask import Flask
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from events import ChangeFeed  # noqa: E402
+from models import setup_db, db, Change  # noqa: E402
+
+
+class ChangeFeedTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        # A file, so the feed's poll thread sees the same database.
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.app = Flask(__name__)
+        setup_db(self.app, 'sqlite:///' + self.path, [])
+        with self.app.app_context():
+            db.create_all()
+        self.feed = ChangeFeed(['checks'], interval=60, buffer_size=3)
+        self.feed._last_seq = self.feed._floor = 0
+
+    def tearDown(self) -> None:
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(self.path)
+
+    def add_changes(self, count):
+        with self.app.app_context():
+            db.session.execute(Change.__table__.insert(), [
+                {'table_name': 'checks', 'row_id': i, 'op': 'delete'}
+                for i in range(count)])
+            db.session.commit()
+
+    def poll(self):
+        with self.app.app_context():
+            return self.feed._poll()
+
+    def seqs(self, changes):
+        return [change['seq'] for change in changes]
+
+    def test_poll_fills_the_buffer(self):
+        self.add_changes(2)
+
+        self.assertFalse(self.poll())
+        changes, complete = self.feed.wait(0, timeout=0)
+
+        self.assertEqual(self.seqs(changes), [1, 2])
+        self.assertTrue(complete)
+        self.assertEqual(self.feed.polls, 1)
+
+    def test_wait_times_out_without_new_entries(self):
+        self.add_changes(1)
+        self.poll()
+
+        changes, complete = self.feed.wait(1, timeout=0.01)
+
+        self.assertEqual(changes, [])
+        self.assertTrue(complete)
+
+    def test_evicted_entries_raise_the_floor(self):
+        self.add_changes(2)
+        self.poll()
+        self.add_changes(3)
+        self.poll()
+
+        self.assertEqual(self.feed._floor, 2)
+        changes, complete = self.feed.wait(1, timeout=0)
+        self.assertEqual(self.seqs(changes), [3, 4, 5])
+        self.assertFalse(complete)
+        changes, complete = self.feed.wait(2, timeout=0)
+        self.assertEqual(self.seqs(changes), [3, 4, 5])
+        self.assertTrue(complete)
+
+    def test_stream_catches_up_from_the_database(self):
+        self.add_changes(4)
+        feed = ChangeFeed(['checks'], interval=60, buffer_size=3)
+
+        with self.app.test_request_context():
+            stream = feed.stream(after_seq=1, heartbeat=0.01)
+            chunks = [next(stream) for _ in range(4)]
+            stream.close()
+            db.session.remove()
+
+        # Started at seq 4, so 2-4 come from the changes table.
+        self.assertEqual(feed._floor, 4)
+        self.assertTrue(chunks[0].startswith('retry:'))
+        self.assertEqual([chunk.split('\n')[0] for chunk in chunks[1:]],
+                         ['id: 2', 'id: 3', 'id: 4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,31 @@
 import unittest
 import json
 from flaskr import create_app
-from models import setup_db, Check, Employee
+from models import PRUNED, setup_db, db, Change, Check, Employee
+from queries import EMBEDDED_CHECKS_LIMIT, encode_cursor
+from auth import jwks_store
+from auth_stand_in import TokenIssuer
 import os
 
-SERVER_TOKEN = os.environ['SERVER_TOKEN']
-MANAGER_TOKEN = os.environ['MANAGER_TOKEN']
+if 'SERVER_TOKEN' in os.environ and 'MANAGER_TOKEN' in os.environ:
+    SERVER_TOKEN = os.environ['SERVER_TOKEN']
+    MANAGER_TOKEN = os.environ['MANAGER_TOKEN']
+    stand_in = None
+else:
+    # No Auth0 tokens: sign our own; each test trusts only the stand-in key.
+    stand_in = TokenIssuer()
+    SERVER_TOKEN = stand_in.mint_role('server')
+    MANAGER_TOKEN = stand_in.mint_role('manager')
+
+# Most statements each endpoint may run, to catch N+1 queries.
+QUERY_BUDGETS = {
+    '/checks': 2,
+    '/checks/summary': 1,
+    '/employees': 2,
+    '/employees?include=checks': 3,
+    '/employees/1/checks': 3,
+    '/changes': 4
+}
 
 database_path = os.environ['DATABASE_URL_TEST']
 if database_path.startswith("postgres://"):
@@ -18,9 +38,73 @@ class RestaurantTestCase(unittest.TestCase):
         self.client = self.app.test_client
         self.database_path = database_path
         db = setup_db(self.app, self.database_path)
+        self.app.config['QUERY_STATS_HEADERS'] = True
+        self.saved_source = (jwks_store.url, jwks_store.keys)
+        if stand_in is not None:
+            stand_in.install()
 
     def tearDown(self) -> None:
-        pass
+        url, keys = self.saved_source
+        jwks_store.configure(url=url, keys=keys)
+
+    def assertQueryBudget(self, res, budget):
+        self.assertLessEqual(int(res.headers['X-Query-Count']), budget)
+
+    def test_get_endpoints_query_budgets(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN
+        }
+
+        for path, budget in QUERY_BUDGETS.items():
+            with self.subTest(path=path):
+                res = self.client().get(path, headers=headers)
+
+                self.assertEqual(res.status_code, 200)
+                self.assertQueryBudget(res, budget)
+
+    def test_write_endpoints_query_budgets(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN
+        }
+
+        res = self.client().post('/employees', json={"name": "Budget"},
+                                 headers=headers)
+        self.assertQueryBudget(res, 4)
+        employee_id = res.get_json()['id']
+
+        res = self.client().patch(f'/employees/{employee_id}',
+                                  json={"name": "Budget Renamed"},
+                                  headers=headers)
+        self.assertQueryBudget(res, 3)
+
+        res = self.client().delete(f'/employees/{employee_id}',
+                                   headers=headers)
+        self.assertQueryBudget(res, 3)
+
+    def test_get_metrics_endpoint(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+        self.client().get('/checks', headers=headers)
+
+        res = self.client().get('/metrics')
+        text = res.get_data(as_text=True)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('route="/checks",method="GET",status="200",'
+                      'phase="auth"', text)
+        self.assertIn('# TYPE response_cache_hit_ratio gauge', text)
+        self.assertIn('# TYPE response_cache_hits_total counter', text)
+        self.assertIn('# TYPE token_cache_hit_ratio gauge', text)
+
+    def test_get_pool_endpoint(self):
+        res = self.client().get('/pool')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertIn('checked_out', data['pool'])
+        self.assertIn('wait_time', data['pool'])
 
     def test_get_checks_endpoint_by_public(self):
         res = self.client().get('/checks')
@@ -55,6 +139,141 @@ class RestaurantTestCase(unittest.TestCase):
         self.assertEqual(data['total_checks'], total_checks_counts)
         self.assertTrue(data['checks'])
 
+    def test_get_checks_endpoint_paginated(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/checks?limit=2', headers=headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['checks']), 2)
+        self.assertTrue(data['next_cursor'])
+
+        res = self.client().get('/checks?limit=2&cursor=' +
+                                data['next_cursor'], headers=headers)
+        next_page = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(next_page['checks'][0]['id'],
+                           data['checks'][-1]['id'])
+
+    def test_get_checks_endpoint_invalid_cursor(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/checks?cursor=not-a-cursor',
+                                headers=headers)
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_get_checks_endpoint_count_modes(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/checks?count=estimated', headers=headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(res.get_json()['total_checks'], int)
+
+        res = self.client().get('/checks?count=none', headers=headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertIsNone(res.get_json()['total_checks'])
+
+        res = self.client().get('/checks?count=approximate', headers=headers)
+        self.assertEqual(res.status_code, 400)
+
+    def test_get_checks_summary_endpoint_by_public(self):
+        res = self.client().get('/checks/summary')
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_get_checks_summary_endpoint_by_server(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/checks/summary', headers=headers)
+        data = res.get_json()
+
+        total_checks_counts = len(Check.query.all())
+        employee_checks_counts = \
+            len(Check.query.filter_by(employee_id=1).all())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_checks'], total_checks_counts)
+        self.assertIn({'employee_id': 1,
+                       'check_count': employee_checks_counts},
+                      data['summary'])
+
+    def test_stream_checks_endpoint_by_public(self):
+        res = self.client().get('/checks/stream')
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_stream_checks_endpoint_resumes_from_last_event_id(self):
+        new_check = Check(employee_id=1)
+        db.session.add(new_check)
+        db.session.commit()
+        check_id = new_check.id
+
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN,
+            "Last-Event-ID": "0"
+        }
+
+        res = self.client().get('/checks/stream', headers=headers,
+                                buffered=False)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'text/event-stream')
+
+        events = []
+        for chunk in res.response:
+            events.append(chunk.decode())
+            if f'"id":{check_id},' in events[-1] or len(events) > 100:
+                break
+        res.close()
+
+        self.assertTrue(events[0].startswith('retry:'))
+        self.assertIn('event: insert', events[-1])
+
+    def test_export_checks_endpoint_by_public(self):
+        res = self.client().get('/checks/export')
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_export_checks_endpoint_json(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/checks/export', headers=headers)
+        data = json.loads(res.get_data())
+
+        total_checks_counts = len(Check.query.all())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(len(data['checks']), total_checks_counts)
+
+    def test_export_checks_endpoint_ndjson(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/checks/export?format=ndjson',
+                                headers=headers)
+        lines = res.get_data(as_text=True).splitlines()
+
+        total_checks_counts = len(Check.query.all())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(lines), total_checks_counts)
+        self.assertIn('employee_id', json.loads(lines[0]))
+
     def test_get_employees_endpoint_by_public(self):
         res = self.client().get('/employees')
 
@@ -88,6 +307,230 @@ class RestaurantTestCase(unittest.TestCase):
         self.assertEqual(data['total_employees'], total_employees_counts)
         self.assertTrue(data['employees'])
 
+    def test_get_employees_endpoint_last_page(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/employees?limit=1000', headers=headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['employees']), data['total_employees'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_get_employees_endpoint_not_modified(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/employees', headers=headers)
+        etag = res.headers['ETag']
+
+        headers['If-None-Match'] = etag
+        res = self.client().get('/employees', headers=headers)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.headers['ETag'], etag)
+
+    def test_get_employees_endpoint_etag_changes_after_write(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN
+        }
+
+        res = self.client().get('/employees', headers=headers)
+        etag = res.headers['ETag']
+
+        self.client().post('/employees', json={"name": "ETag Employee"},
+                           headers=headers)
+
+        headers['If-None-Match'] = etag
+        res = self.client().get('/employees', headers=headers)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_get_employees_endpoint_cached(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        first = self.client().get('/employees', headers=headers)
+        res = self.client().get('/employees', headers=headers)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['X-Cache'], 'HIT')
+        self.assertEqual(res.data, first.data)
+        self.assertEqual(res.headers['ETag'], first.headers['ETag'])
+
+    def test_get_employees_endpoint_cache_invalidated_by_write(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN
+        }
+
+        self.client().get('/employees?limit=1000', headers=headers)
+        res = self.client().post('/employees',
+                                 json={"name": "Cached Employee"},
+                                 headers=headers)
+        employee_id = res.get_json()['id']
+
+        res = self.client().get('/employees?limit=1000', headers=headers)
+        data = res.get_json()
+
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertIn(employee_id,
+                      [employee['id'] for employee in data['employees']])
+
+    def test_get_employees_endpoint_include_checks(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/employees?include=checks', headers=headers)
+        data = res.get_json()
+
+        employee = Employee.query.get(data['employees'][0]['id'])
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['employees'][0]['checks']),
+                         len(employee.checks))
+
+    def test_get_employees_endpoint_include_checks_is_capped(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN
+        }
+        res = self.client().post('/employees', json={"name": "Busy"},
+                                 headers=headers)
+        employee_id = res.get_json()['id']
+        db.session.add_all([Check(employee_id=employee_id)
+                            for _ in range(EMBEDDED_CHECKS_LIMIT + 2)])
+        db.session.commit()
+
+        cursor = encode_cursor(employee_id - 1)
+        res = self.client().get(
+            f'/employees?include=checks&limit=1&cursor={cursor}',
+            headers=headers)
+        employee = res.get_json()['employees'][0]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertQueryBudget(res, QUERY_BUDGETS['/employees?include=checks'])
+        self.assertEqual(len(employee['checks']), EMBEDDED_CHECKS_LIMIT)
+
+        res = self.client().get(
+            f'/employees/{employee_id}/checks'
+            f'?cursor={employee["checks_next_cursor"]}', headers=headers)
+        self.assertEqual(len(res.get_json()['checks']), 2)
+
+        Check.query.filter_by(employee_id=employee_id).delete()
+        db.session.commit()
+        self.client().delete(f'/employees/{employee_id}', headers=headers)
+
+    @unittest.skipIf(stand_in is None, 'needs the stand-in token issuer')
+    def test_get_employees_endpoint_include_checks_needs_read_checks(self):
+        server = self.client().get('/employees?include=checks', headers={
+            "Authorization": "Bearer " + SERVER_TOKEN
+        })
+        headers = {
+            "Authorization": "Bearer " + stand_in.mint(['read:employees'])
+        }
+
+        res = self.client().get('/employees?include=checks', headers=headers)
+        self.assertEqual(res.status_code, 403)
+
+        # Nor may it revalidate, or be served, the authorized response.
+        headers['If-None-Match'] = server.headers['ETag']
+        res = self.client().get('/employees?include=checks', headers=headers)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client().get('/employees', headers=headers)
+        self.assertEqual(res.status_code, 200)
+
+    def test_get_changes_endpoint_by_public(self):
+        res = self.client().get('/changes')
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_get_changes_endpoint_after_write(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN
+        }
+
+        res = self.client().get('/changes?since=0&limit=1000',
+                                headers=headers)
+        since = res.get_json()['next_since']
+
+        res = self.client().post('/employees', json={"name": "Synced"},
+                                 headers=headers)
+        employee_id = res.get_json()['id']
+        self.client().delete('/employees/' + str(employee_id),
+                             headers=headers)
+
+        res = self.client().get('/changes?since=' + str(since),
+                                headers=headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [(change['id'], change['op']) for change in data['changes']],
+            [(employee_id, 'insert'), (employee_id, 'delete')])
+        self.assertGreater(data['next_since'], since)
+
+    def test_get_changes_endpoint_invalid_since(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/changes?since=yesterday', headers=headers)
+        self.assertEqual(res.status_code, 400)
+
+    def test_get_changes_endpoint_since_pruned(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+        # What prune_changes leaves behind, below every real entry.
+        marker = Change(seq=0, table_name='changes', row_id=0, op=PRUNED)
+        db.session.add(marker)
+        db.session.commit()
+
+        try:
+            res = self.client().get('/changes?since=-1', headers=headers)
+            self.assertEqual(res.status_code, 410)
+            self.assertEqual(res.get_json()['oldest_since'], 0)
+
+            res = self.client().get('/changes?since=0', headers=headers)
+            self.assertEqual(res.status_code, 200)
+        finally:
+            db.session.delete(marker)
+            db.session.commit()
+
+    def test_get_employee_checks_endpoint_by_public(self):
+        res = self.client().get('/employees/1/checks')
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_get_employee_checks_endpoint_by_server(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/employees/1/checks', headers=headers)
+        data = res.get_json()
+
+        total_checks_counts = len(Check.query.filter_by(employee_id=1).all())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_checks'], total_checks_counts)
+        self.assertTrue(all(check['employee_id'] == 1
+                            for check in data['checks']))
+
+    def test_get_employee_checks_endpoint_not_found(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        res = self.client().get('/employees/9999/checks', headers=headers)
+        self.assertEqual(res.status_code, 404)
+
     def test_post_employees_endpoint_by_public(self):
         res = self.client().post('/employees')
 
@@ -117,6 +560,45 @@ class RestaurantTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['id'], 5)
 
+    def test_post_employees_bulk_endpoint_by_server(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        body_json = {"employees": [{"name": "Bulk Employee"}]}
+        res = self.client().post('/employees/bulk', json=body_json,
+                                 headers=headers)
+        self.assertEqual(res.status_code, 403)
+
+    def test_post_employees_bulk_endpoint_by_manager(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN,
+            "Content-Type": "application/json"
+        }
+
+        body_json = {"employees": [{"name": "Bulk Employee 1"},
+                                   {"name": "Bulk Employee 2"}]}
+        res = self.client().post('/employees/bulk', json=body_json,
+                                 headers=headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_created'], 2)
+        self.assertLess(data['ids'][0], data['ids'][1])
+        self.assertEqual(Employee.query.get(data['ids'][1]).name,
+                         "Bulk Employee 2")
+
+    def test_post_employees_bulk_endpoint_missing_name(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN,
+            "Content-Type": "application/json"
+        }
+
+        body_json = {"employees": [{"name": "Bulk Employee"}, {}]}
+        res = self.client().post('/employees/bulk', json=body_json,
+                                 headers=headers)
+        self.assertEqual(res.status_code, 400)
+
     def test_patch_employees_endpoint_by_public(self):
         res = self.client().patch('/employees/2')
 
@@ -148,6 +630,70 @@ class RestaurantTestCase(unittest.TestCase):
         self.assertTrue(data['id'], 2)
         self.assertEqual(updated_employee.name, "Updated Employee")
 
+    def test_patch_employees_endpoint_not_found(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN,
+            "Content-Type": "application/json"
+        }
+
+        body_json = {"name": "Updated Employee"}
+        res = self.client().patch('/employees/9999', json=body_json,
+                                  headers=headers)
+        self.assertEqual(res.status_code, 404)
+
+    def test_patch_employees_bulk_endpoint_by_server(self):
+        headers = {
+            "Authorization": "Bearer " + SERVER_TOKEN
+        }
+
+        body_json = {"employees": [{"id": 2, "name": "Bulk Update"}]}
+        res = self.client().patch('/employees/bulk', json=body_json,
+                                  headers=headers)
+        self.assertEqual(res.status_code, 403)
+
+    def test_patch_employees_bulk_endpoint_by_manager(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN,
+            "Content-Type": "application/json"
+        }
+
+        body_json = {"employees": [{"id": 1, "name": "Bulk Update"},
+                                   {"id": 9999, "name": "Missing"}]}
+        res = self.client().patch('/employees/bulk', json=body_json,
+                                  headers=headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_updated'], 1)
+        self.assertEqual(data['results'], [
+            {'id': 1, 'status': 'updated'},
+            {'id': 9999, 'status': 'not_found'}
+        ])
+        self.assertEqual(Employee.query.get(1).name, "Bulk Update")
+
+    def test_delete_employees_bulk_endpoint_by_manager(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN,
+            "Content-Type": "application/json"
+        }
+
+        body_json = {"employees": [{"name": "Bulk Delete 1"},
+                                   {"name": "Bulk Delete 2"}]}
+        res = self.client().post('/employees/bulk', json=body_json,
+                                 headers=headers)
+        ids = res.get_json()['ids']
+
+        res = self.client().delete('/employees/bulk',
+                                   json={"ids": ids + [9999]},
+                                   headers=headers)
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_deleted'], 2)
+        self.assertEqual(data['results'][-1],
+                         {'id': 9999, 'status': 'not_found'})
+        self.assertIsNone(Employee.query.get(ids[0]))
+
     def test_delete_employees_endpoint_by_public(self):
         res = self.client().delete('/employees/3')
 
@@ -179,6 +725,14 @@ class RestaurantTestCase(unittest.TestCase):
         self.assertTrue(data['id'], 3)
         self.assertIsNone(updated_employee)
 
+    def test_delete_employees_endpoint_not_found(self):
+        headers = {
+            "Authorization": "Bearer " + MANAGER_TOKEN
+        }
+
+        res = self.client().delete('/employees/9999', headers=headers)
+        self.assertEqual(res.status_code, 404)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import json
+from datetime import datetime
+from flask import Flask, jsonify, request
+from json_provider import (OrjsonProvider, available_providers,
+                           get_provider, init_json_provider, orjson)
+from request_metrics import RequestMetrics, init_request_metrics
+
+PAYLOAD = {
+    'success': True,
+    'employees': [{'name': 'Zoë', 'id': 2, 'checks': [{'id': 7}]}],
+    'next_cursor': None,
+    'summary': {1: 3}
+}
+
+
+def make_app(provider, metrics):
+    app = Flask(__name__)
+    init_json_provider(app, provider)
+    init_request_metrics(app, metrics)
+
+    @app.route('/payload')
+    def payload():
+        return jsonify(PAYLOAD)
+
+    @app.route('/dated')
+    def dated():
+        return jsonify({'at': datetime(2022, 3, 30, 12, 0, 0)})
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify({'body': request.get_json()})
+
+    return app
+
+
+class JSONProviderTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.metrics = RequestMetrics()
+        self.apps = [(provider.name, make_app(provider, self.metrics))
+                     for provider in available_providers()]
+
+    def test_providers_encode_the_same_data(self):
+        expected = json.loads(json.dumps(PAYLOAD))
+
+        for name, app in self.apps:
+            res = app.test_client().get('/payload')
+
+            self.assertEqual(res.mimetype, 'application/json', name)
+            self.assertEqual(json.loads(res.data), expected, name)
+            # Flask sorts keys unless JSON_SORT_KEYS is turned off.
+            self.assertTrue(res.data.startswith(b'{"employees":'), name)
+
+    def test_dates_keep_flask_format(self):
+        for name, app in self.apps:
+            res = app.test_client().get('/dated')
+
+            self.assertEqual(res.get_json()['at'],
+                             'Wed, 30 Mar 2022 12:00:00 GMT', name)
+
+    def test_request_bodies_are_decoded_and_encoding_is_timed(self):
+        for name, app in self.apps:
+            res = app.test_client().post('/echo', json={'name': 'Zoë'})
+
+            self.assertEqual(res.get_json(), {'body': {'name': 'Zoë'}},
+                             name)
+
+        self.assertIn('http_request_duration_seconds_count{route="/echo",'
+                      'method="POST",status="200",phase="serialization"} '
+                      f'{len(self.apps)}', self.metrics.exposition())
+
+    def test_malformed_body_is_a_bad_request(self):
+        for name, app in self.apps:
+            res = app.test_client().post(
+                '/echo', data='{"name":', content_type='application/json')
+
+            self.assertEqual(res.status_code, 400, name)
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_auto_prefers_orjson(self):
+        self.assertIsInstance(get_provider('auto'), OrjsonProvider)
+
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            get_provider('simdjson')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+from flask import Flask, jsonify
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from models import setup_db, db, Employee  # noqa: E402
+from query_stats import init_query_stats  # noqa: E402
+
+
+def make_app(database_url):
+    app = Flask(__name__)
+    setup_db(app, database_url, [])
+    init_query_stats(app)
+
+    @app.route('/employees')
+    def employees():
+        names = [employee.name for employee in Employee.query.all()]
+        return jsonify({'count': Employee.query.count(), 'names': names})
+
+    return app
+
+
+class QueryStatsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = make_app('sqlite://')
+        self.client = self.app.test_client
+        with self.app.app_context():
+            db.create_all()
+
+    def test_headers_report_queries_when_enabled(self):
+        self.app.config['QUERY_STATS_HEADERS'] = True
+
+        res = self.client().get('/employees')
+
+        self.assertEqual(res.headers['X-Query-Count'], '2')
+        self.assertGreater(float(res.headers['X-Query-Time']), 0)
+
+    def test_no_headers_by_default(self):
+        res = self.client().get('/employees')
+
+        self.assertNotIn('X-Query-Count', res.headers)
+
+    def test_slow_request_is_logged(self):
+        self.app.config['SLOW_REQUEST_THRESHOLD'] = 0
+
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.client().get('/employees')
+
+        self.assertIn('2 queries', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
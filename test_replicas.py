@@ -0,0 +1,121 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+from flask import Flask, g
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from models import setup_db, db, Employee  # noqa: E402
+from replicas import replica_engine_options, use_replica  # noqa: E402
+
+MAX_LAG = 0.2
+
+
+def temp_database_url():
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    return path, 'sqlite:///' + path
+
+
+@use_replica(('employees',))
+def employee_names():
+    return [employee.name for employee in Employee.query.all()]
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Routing between two local SQLite databases, a primary and a
+    "replica" that never receives the primary's writes.
+    """
+
+    def setUp(self) -> None:
+        self.primary_path, primary_url = temp_database_url()
+        self.replica_path, replica_url = temp_database_url()
+
+        self.app = Flask(__name__)
+        setup_db(self.app, primary_url, [replica_url])
+        self.replicas = self.app.extensions['replicas']
+        self.replicas.max_lag = MAX_LAG
+        self.replica = self.replicas.replicas[0]
+        self.replica.refresh()
+
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Employee(name='Primary Employee'))
+            db.session.commit()
+            db.Model.metadata.create_all(self.replica.engine)
+            with self.replica.engine.begin() as connection:
+                connection.execute(Employee.__table__.insert(),
+                                   {'name': 'Replica Employee'})
+        # Let the seed write age past the staleness bound.
+        time.sleep(MAX_LAG)
+
+    def tearDown(self) -> None:
+        with self.app.app_context():
+            db.session.remove()
+            db.get_engine().dispose()
+        self.replica.engine.dispose()
+        os.remove(self.primary_path)
+        os.remove(self.replica_path)
+
+    def read_names(self):
+        with self.app.test_request_context('/employees'):
+            return employee_names()
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.read_names(), ['Replica Employee'])
+
+    def test_recent_write_is_read_from_primary(self):
+        with self.app.app_context():
+            db.session.add(Employee(name='New Employee'))
+            db.session.commit()
+
+        self.assertIn('New Employee', self.read_names())
+
+        time.sleep(MAX_LAG)
+        self.assertEqual(self.read_names(), ['Replica Employee'])
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.replica.measure_lag = lambda: None
+        self.replica.refresh()
+
+        self.assertEqual(self.read_names(), ['Primary Employee'])
+
+    def test_pending_lag_measurement_uses_primary(self):
+        answered = threading.Event()
+        self.replica.measure_lag = lambda: answered.wait(5) and 0.0
+        self.replica._checked_at = None
+
+        started = time.monotonic()
+        self.assertEqual(self.read_names(), ['Primary Employee'])
+        self.assertEqual(self.read_names(), ['Primary Employee'])
+        self.assertLess(time.monotonic() - started, 1)
+
+        answered.set()
+        for _ in range(100):
+            if self.replica.lag() == 0.0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.read_names(), ['Replica Employee'])
+
+    def test_replica_connections_time_out(self):
+        options = replica_engine_options('postgresql://replica/capstone')
+
+        self.assertEqual(options['connect_args'], {'connect_timeout': 2})
+
+    def test_writes_go_to_primary(self):
+        with self.app.test_request_context('/employees'):
+            g.replica_engine = self.replica.engine
+            db.session.execute(Employee.__table__.insert(),
+                               {'name': 'Written Employee'})
+            db.session.commit()
+            db.session.remove()
+
+        with self.app.app_context():
+            names = [employee.name for employee in Employee.query.all()]
+        self.assertIn('Written Employee', names)
+
+
+if __name__ == '__main__':
+    unittest.main()
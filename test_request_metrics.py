@@ -0,0 +1,71 @@
+import unittest
+from flask import Flask, jsonify
+from metrics import stats_exposition
+from request_metrics import RequestMetrics, init_request_metrics
+
+
+class RequestMetricsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.metrics = RequestMetrics(buckets=(0.1, 1))
+        self.app = Flask(__name__)
+        init_request_metrics(self.app, self.metrics)
+
+        @self.app.route('/items/<int:item_id>')
+        def item(item_id):
+            return jsonify({'id': item_id})
+
+        self.client = self.app.test_client
+
+    def test_exposition_format(self):
+        self.metrics.observe('/items', 'GET', 200, 'total', 0.5)
+        self.metrics.observe('/items', 'GET', 200, 'total', 2)
+
+        text = self.metrics.exposition()
+
+        labels = 'route="/items",method="GET",status="200",phase="total"'
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="0.1"}} 0',
+            text)
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="1"}} 1',
+            text)
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            text)
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 2', text)
+
+    def test_requests_are_timed_per_route_and_status(self):
+        self.client().get('/items/1')
+        self.client().get('/items/2')
+        self.client().get('/missing')
+
+        text = self.metrics.exposition()
+
+        self.assertIn('http_request_duration_seconds_count{'
+                      'route="/items/<int:item_id>",method="GET",'
+                      'status="200",phase="total"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{'
+                      'route="/items/<int:item_id>",method="GET",'
+                      'status="200",phase="serialization"} 2', text)
+        self.assertIn('route="unmatched",method="GET",status="404"', text)
+
+    def test_cache_stats_exposition(self):
+        text = stats_exposition('response_cache', {
+            'entries': 2, 'hits': 3, 'misses': 1, 'hit_ratio': 0.75})
+
+        self.assertEqual(text.splitlines(), [
+            '# TYPE response_cache_entries gauge',
+            'response_cache_entries 2',
+            '# TYPE response_cache_hits_total counter',
+            'response_cache_hits_total 3',
+            '# TYPE response_cache_misses_total counter',
+            'response_cache_misses_total 1',
+            '# TYPE response_cache_hit_ratio gauge',
+            'response_cache_hit_ratio 0.75'
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
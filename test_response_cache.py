@@ -0,0 +1,78 @@
+import unittest
+from response_cache import CachedResponse, ResponseCache
+
+
+def make_entry(body, tables=('employees',), versions=(0,)):
+    return CachedResponse(body, 'application/json', 'etag', tables,
+                          versions)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = ResponseCache(max_bytes=10)
+
+    def test_unchanged_versions_are_a_hit(self):
+        self.cache.put('a', make_entry(b'abc'))
+
+        self.assertEqual(self.cache.get('a', (0,)).body, b'abc')
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_changed_versions_are_a_miss(self):
+        self.cache.put('a', make_entry(b'abc'))
+
+        self.assertIsNone(self.cache.get('a', (1,)))
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_invalidate_only_drops_entries_for_written_tables(self):
+        self.cache.put('employees', make_entry(b'abc'))
+        self.cache.put('checks', make_entry(b'def', ('checks',)))
+
+        self.cache.invalidate(['checks'])
+
+        self.assertIsNotNone(self.cache.get('employees', (0,)))
+        self.assertIsNone(self.cache.get('checks', (0,)))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.put('a', make_entry(b'aaaa'))
+        self.cache.put('b', make_entry(b'bbbb'))
+        self.cache.get('a', (0,))
+        self.cache.put('c', make_entry(b'cccc'))
+
+        self.assertIsNotNone(self.cache.get('a', (0,)))
+        self.assertIsNone(self.cache.get('b', (0,)))
+        self.assertEqual(self.cache.stats()['size'], 8)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_oversized_body_is_not_cached(self):
+        self.cache.put('a', make_entry(b'x' * 11))
+
+        self.assertIsNone(self.cache.get('a', (0,)))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_encodings_count_towards_the_size(self):
+        entry = make_entry(b'aaaa')
+        self.cache.put('a', entry)
+        self.cache.put('b', make_entry(b'bbbb'))
+        self.cache.get('a', (0,))
+
+        self.cache.add_encoding('a', entry, 'gzip', b'zz')
+        self.cache.add_encoding('a', entry, 'br', b'yy')
+
+        self.assertIsNone(self.cache.get('b', (0,)))
+        self.assertEqual(self.cache.get('a', (0,)).encodings,
+                         {'gzip': b'zz', 'br': b'yy'})
+        self.assertEqual(self.cache.stats()['size'], 8)
+
+    def test_encoding_of_a_removed_entry_is_not_kept(self):
+        entry = make_entry(b'aaaa')
+        self.cache.put('a', entry)
+        self.cache.invalidate(['employees'])
+
+        self.cache.add_encoding('a', entry, 'gzip', b'zz')
+
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
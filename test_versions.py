@@ -0,0 +1,103 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+from flask import Flask
+from versions import SharedTableVersions, default_table_versions_path, \
+    list_etag
+
+WORKERS = 4
+BUMPS = 200
+
+
+def bump_worker(versions, start, done):
+    start.wait()
+    for _ in range(BUMPS):
+        versions.bump('employees')
+    done.put((versions.epoch, versions.get('employees')))
+
+
+class SharedTableVersionsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(self.path)
+        # Like gunicorn's master, create the versions before forking
+        # the workers.
+        self.versions = SharedTableVersions(self.path)
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_bump_is_seen_by_other_instances(self):
+        other = SharedTableVersions(self.path)
+
+        self.versions.bump('employees')
+
+        self.assertEqual(other.epoch, self.versions.epoch)
+        self.assertEqual(other.get('employees'), 1)
+        self.assertEqual(other.snapshot(['employees', 'checks']), (1, 0))
+
+    def test_concurrent_bumps_from_worker_processes(self):
+        context = multiprocessing.get_context('fork')
+        start = context.Event()
+        done = context.Queue()
+        workers = [
+            context.Process(target=bump_worker,
+                            args=(self.versions, start, done))
+            for _ in range(WORKERS)
+        ]
+        for worker in workers:
+            worker.start()
+        start.set()
+        results = [done.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self.versions.get('employees'), WORKERS * BUMPS)
+        self.assertEqual({epoch for epoch, _ in results},
+                         {self.versions.epoch})
+
+    def test_new_file_gets_a_new_epoch(self):
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(path)
+        try:
+            self.assertNotEqual(SharedTableVersions(path).epoch,
+                                self.versions.epoch)
+        finally:
+            os.remove(path)
+
+
+class DefaultPathTestCase(unittest.TestCase):
+    def test_each_database_gets_its_own_file(self):
+        url = 'postgresql://localhost/capstone'
+        dev = default_table_versions_path(url)
+        test = default_table_versions_path(url + '_test')
+
+        self.assertNotEqual(dev, test)
+        self.assertEqual(dev, default_table_versions_path(url))
+        self.assertEqual(os.path.dirname(dev), tempfile.gettempdir())
+
+
+class ListETagTestCase(unittest.TestCase):
+    def etag(self, url, scope=''):
+        with Flask(__name__).test_request_context(url) as ctx:
+            return list_etag(ctx.request, 'checks', versions=(1,),
+                             scope=scope)
+
+    def test_etag_depends_on_path_and_query_string(self):
+        etags = {self.etag(url) for url in (
+            '/checks', '/checks/summary', '/employees/1/checks',
+            '/employees/2/checks', '/checks?limit=5')}
+
+        self.assertEqual(len(etags), 5)
+        self.assertEqual(self.etag('/checks'), self.etag('/checks'))
+
+    def test_etag_depends_on_scope(self):
+        self.assertNotEqual(self.etag('/checks', 'a'),
+                            self.etag('/checks', 'b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+TABLE_VERSIONS_BACKEND = os.environ.get('TABLE_VERSIONS_BACKEND', 'shared')
+
+
+def default_table_versions_path(database_url):
+    """A versions file per database, so apps on the same host that use
+    different databases never bump each other's ETags.
+    """
+    digest = hashlib.sha256(database_url.encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(),
+                        f'capstone-table-versions-{digest}')
+
+
+TABLE_VERSIONS_PATH = os.environ.get(
+    'TABLE_VERSIONS_PATH',
+    default_table_versions_path(os.environ.get('DATABASE_URL', '')))
+
+
+class TableVersions:
+    """Per-table change counters, bumped after each committed write.
+
+    Counters restart at zero with the process, so every ETag also carries
+    a per-process epoch; a restarted worker can never match an old ETag.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex
+        self._versions = {}
+        self._written_at = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def get(self, table):
+        return self._versions.get(table, 0)
+
+    def snapshot(self, tables):
+        return tuple(self.get(table) for table in tables)
+
+    def written_within(self, tables, seconds):
+        """Whether any of `tables` had a write committed in the last
+        `seconds` seconds.
+        """
+        cutoff = time.time() - seconds
+        return any(self._written_at.get(table, 0) > cutoff
+                   for table in tables)
+
+    def bump(self, *tables):
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._written_at[table] = now
+        for listener in self._listeners:
+            listener(tables)
+
+    def subscribe(self, listener):
+        """Call `listener(tables)` after every bump."""
+        self._listeners.append(listener)
+
+
+class SharedTableVersions(TableVersions):
+    """Table versions in a memory-mapped file shared by every worker.
+
+    gunicorn workers are separate processes, so with the local backend a
+    write in one worker is invisible to the others' ETags and response
+    caches.  Here all workers map the same file: bumps are serialized with
+    flock, and the epoch is written once, by whichever process creates the
+    file, so every worker builds the same ETags.
+    """
+
+    MAGIC = b'TBLVER02'
+    MAX_TABLES = 64
+    _header = struct.Struct('8s32s')
+    # Table name, version, time of the last bump.
+    _slot = struct.Struct('32sQd')
+
+    def __init__(self, path=TABLE_VERSIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._slots = {}
+        self._open()
+
+    def _open(self):
+        size = self._header.size + self.MAX_TABLES * self._slot.size
+        self._pid = os.getpid()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+            magic, epoch = self._header.unpack_from(self._map, 0)
+            if magic != self.MAGIC:
+                epoch = uuid.uuid4().hex.encode()
+                self._map[:] = bytes(size)
+                self._header.pack_into(self._map, 0, self.MAGIC, epoch)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.epoch = epoch.decode()
+
+    @contextmanager
+    def _locked(self, operation=fcntl.LOCK_EX):
+        # flock excludes other processes; threads share the descriptor, so
+        # they also need the thread lock.
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked child shares its parent's open file description,
+                # and with it the parent's flock, so it opens its own.
+                os.close(self._fd)
+                self._open()
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offset(self, index):
+        return self._header.size + index * self._slot.size
+
+    def _find_slot(self, table, create=False):
+        """Index of `table`'s slot; call with the file locked."""
+        if table in self._slots:
+            return self._slots[table]
+        name = table.encode()
+        if len(name) > 32:
+            raise ValueError(f'Table name too long: {table}')
+        for index in range(self.MAX_TABLES):
+            slot_name = self._slot.unpack_from(
+                self._map, self._offset(index))[0].rstrip(b'\0')
+            if slot_name == name or (create and not slot_name):
+                if not slot_name:
+                    self._slot.pack_into(self._map, self._offset(index),
+                                         name, 0, 0)
+                self._slots[table] = index
+                return index
+            if not slot_name:
+                return None
+        raise RuntimeError('Table versions file is full')
+
+    def _read(self, table):
+        """(version, written_at) of `table`; call with the file locked."""
+        index = self._find_slot(table)
+        if index is None:
+            return 0, 0
+        return self._slot.unpack_from(self._map, self._offset(index))[1:]
+
+    def get(self, table):
+        with self._locked(fcntl.LOCK_SH):
+            return self._read(table)[0]
+
+    def snapshot(self, tables):
+        with self._locked(fcntl.LOCK_SH):
+            return tuple(self._read(table)[0] for table in tables)
+
+    def written_within(self, tables, seconds):
+        cutoff = time.time() - seconds
+        with self._locked(fcntl.LOCK_SH):
+            return any(self._read(table)[1] > cutoff for table in tables)
+
+    def bump(self, *tables):
+        now = time.time()
+        with self._locked():
+            for table in tables:
+                offset = self._offset(self._find_slot(table, create=True))
+                version = self._slot.unpack_from(self._map, offset)[1]
+                self._slot.pack_into(self._map, offset, table.encode(),
+                                     version + 1, now)
+        for listener in self._listeners:
+            listener(tables)
+
+
+def make_table_versions(backend=TABLE_VERSIONS_BACKEND):
+    if backend == 'shared':
+        return SharedTableVersions()
+    if backend == 'local':
+        return TableVersions()
+    raise ValueError(f'Unknown table versions backend: {backend}')
+
+
+table_versions = make_table_versions()
+
+
+def touch(session, *tables):
+    """Mark `tables` as written by the session's current transaction.
+
+    ORM flushes are tracked automatically; Core statements executed through
+    the session must call this so the versions are bumped on commit.
+    """
+    session.info.setdefault('touched_tables', set()).update(tables)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_tables(session, flush_context):
+    tables = {
+        instance.__table__.name
+        for instance in (*session.new, *session.dirty, *session.deleted)
+    }
+    if tables:
+        touch(session, *tables)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_tables(session):
+    tables = session.info.pop('touched_tables', None)
+    if tables:
+        table_versions.bump(*tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_tables(session):
+    session.info.pop('touched_tables', None)
+
+
+def list_etag(request, *tables, versions=None, scope=''):
+    """ETag for a list response built from `tables`, the path and the query
+    string.
+
+    Pass `versions`, a table_versions.snapshot(tables), to build the ETag
+    from versions read earlier rather than the current ones, and `scope`
+    to tell apart responses that differ by caller, e.g. by permissions.
+    """
+    if versions is None:
+        versions = table_versions.snapshot(tables)
+    versions = ','.join(f'{table}.{version}'
+                        for table, version in zip(tables, versions))
+    key = f'{table_versions.epoch}|{versions}|{request.path}|' \
+        f'{request.query_string.decode()}|{scope}'
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response